@@ -1,6 +1,7 @@
 #!/usr/bin/python
 
 import sys
+from PdbWriterLib import PDBTemplate
 
 #from Bio.PDB.PDBParser import PDBParser
 
@@ -108,6 +109,7 @@ atoms3 = []
 bonds = []
 box = []
 A = []
+pdb_template = None
 
 out = open(output_file, 'w')
 
@@ -221,9 +223,13 @@ def print_atom_array():
 		ia.write_(out)
 
 def print_pdb():
-	for ia in atoms3:
-		ia.write_(out)
-	out.write("END\n");
+	# The topology is the same for every frame, so atoms3 is only
+	# built once and later frames just format new coordinates
+	global pdb_template
+	if pdb_template is None:
+		convertToPDB()
+		pdb_template = PDBTemplate(atoms3)
+	pdb_template.write_model(out, atoms2)
 
 def print_psf():
 	space8 = "        "
@@ -257,13 +263,11 @@ if snapshot<0:
 			if item == "TIMESTEP":
 				if len(atoms)>0:
 					buildAllAtoms()
-					convertToPDB()
 					n_atoms = len(atoms2)
 					print_pdb()
 				step = int(l)
 				atoms = []
 				atoms2 = []
-				atoms3 = []
 				box = []
 				A = []
 				nFrame = nFrame + 1
@@ -288,7 +292,6 @@ if snapshot<0:
 	
 	if len(atoms)>0:
 		buildAllAtoms()
-		convertToPDB()
 		n_atoms = len(atoms2)
 		print_pdb()
 		buildBonds()
@@ -325,7 +328,6 @@ else:
 				atoms.append(atom)
 	if len(atoms)>0:
 		buildAllAtoms()
-		convertToPDB()
 		n_atoms = len(atoms2)
 		print_pdb()
 		buildBonds()
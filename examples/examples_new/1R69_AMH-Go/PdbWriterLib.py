@@ -0,0 +1,80 @@
+#!/usr/bin/python
+
+# ----------------------------------------------------------------------
+# Copyright (2010) Aram Davtyan and Garegin Papoian
+
+# Papoian's Group, University of Maryland at Collage Park
+# http://papoian.chem.umd.edu/
+
+# Preformatted PDB writer shared by the trajectory conversion scripts.
+# The columns that do not change between frames (serial, atom name,
+# residue name, chain, residue number, element) are formatted once per
+# topology. Every frame is then rendered with a single string formatting
+# call and written to the output as one block.
+
+# Last Update: 10/19/2026
+# ----------------------------------------------------------------------
+
+class PDBTemplate:
+	natoms = 0
+	bfactor = False
+	fmt = ''
+
+	def __init__(self, atoms, bfactor=False):
+		"""atoms is a list of PDB_Atom-like objects with no, ty, res, chain,
+		res_no and atm attributes. If bfactor is True every frame has to
+		supply one B-factor value per atom (list or numpy array), otherwise
+		0.00 is written."""
+		self.natoms = len(atoms)
+		self.bfactor = bfactor
+		lines = []
+		for ia in atoms:
+			chain = getattr(ia, 'chain', 'T')
+			prefix = 'ATOM' + ('       '+str(ia.no))[-7:] + '  ' + (ia.ty+'    ')[:4] + ('   '+ia.res)[-3:] + ' ' + chain + ('    '+str(ia.res_no))[-4:]
+			suffix = ('            '+ia.atm)[-12:] + '  '
+			prefix = prefix.replace('%', '%%')
+			suffix = suffix.replace('%', '%%')
+			if bfactor:
+				lines.append(prefix + '%12.3f%8.3f%8.3f  1.00%6.2f' + suffix + '\n')
+			else:
+				lines.append(prefix + '%12.3f%8.3f%8.3f  1.00  0.00' + suffix + '\n')
+		self.fmt = ''.join(lines)
+
+	def format_(self, coords, bfactors=None):
+		"""Return the ATOM records of one frame as a single string.
+		coords is either a list of objects with x, y, z attributes, a list
+		of [x, y, z] triples, a flat list of 3*natoms values or a numpy
+		array."""
+		if hasattr(coords, 'ravel'):
+			values = coords.ravel().tolist()
+			if len(values)!=3*self.natoms:
+				raise ValueError("Frame has %d values, topology has %d atoms" % (len(values)/3, self.natoms))
+		elif len(coords)==3*self.natoms:
+			values = list(coords)
+		elif len(coords)==self.natoms:
+			if self.natoms>0 and hasattr(coords[0], 'x'):
+				values = [v for ia in coords for v in (ia.x, ia.y, ia.z)]
+			else:
+				values = [v for xyz in coords for v in xyz]
+		else:
+			raise ValueError("Frame has %d values, topology has %d atoms" % (len(coords), self.natoms))
+		if self.bfactor:
+			if bfactors is None or len(bfactors)!=self.natoms:
+				raise ValueError("One B-factor value per atom is required")
+			flat = [0.0]*(4*self.natoms)
+			flat[0::4] = values[0::3]
+			flat[1::4] = values[1::3]
+			flat[2::4] = values[2::3]
+			if hasattr(bfactors, 'tolist'): bfactors = bfactors.tolist()
+			flat[3::4] = list(bfactors)
+			values = flat
+		return self.fmt % tuple(values)
+
+	def write_model(self, f, coords, model=None, bfactors=None):
+		"""Write one frame. Without a model number the frame is terminated
+		with END, otherwise it is wrapped into MODEL/ENDMDL records."""
+		block = self.format_(coords, bfactors)
+		if model is None:
+			f.write(block + "END\n")
+		else:
+			f.write('MODEL        '+str(model)+'\n' + block + "ENDMDL\n")
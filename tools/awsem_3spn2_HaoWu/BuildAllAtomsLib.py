@@ -0,0 +1,349 @@
+#!/usr/bin/python
+
+# ----------------------------------------------------------------------
+# Copyright (2010) Aram Davtyan and Garegin Papoian
+
+# Papoian's Group, University of Maryland at Collage Park
+# http://papoian.chem.umd.edu/
+
+# Shared reconstruction engine for the BuildAllAtomsFromLammps scripts.
+# The topology (residues, chains, 3SPN2 DNA sites, PDB records and bonds)
+# is built once from the atom types of the first frame. Every frame is
+# then reconstructed with numpy index arrays: N and C' atoms inside the
+# chains from the CA(i), CA(i+1) and O(i) positions, and optionally the
+# N- and C-terminal atoms from the ideal backbone geometry.
+
+# Last Update: 10/19/2026
+# ----------------------------------------------------------------------
+
+import sys
+import numpy as np
+
+# Parameters for recovering N and C-prime atoms
+an = 0.4831806
+bn = 0.7032820
+cn = -0.1864262
+ap = 0.4436538
+bp = 0.2352006
+cp = 0.3211455
+
+rNCa = 1.45808
+rCaCp = 1.52469
+rCpO = 1.23156
+psi_NCaCp = 1.94437215835
+psi_CaCpO = 2.10317155324
+theta_NCaCpO = 2.4
+
+# LAMMPS atom types of protein only systems
+protein_atom_desc = {'1' : 'C-Alpha', '2' : 'N', '3' : 'O', '4' : 'C-Beta', '5' : 'H-Beta', '6' : 'C-Prime'}
+
+# LAMMPS atom types of AWSEM-3SPN2 protein-DNA systems. DNA types are
+# P S A T G C 5A 5T 5G 5C 3A 3T 3G 3C, protein types start from 15
+dna_atom_desc = {'1' : 'P', '2' : 'S', '3' : 'B', '4' : 'B', '5' : 'B', '6' : 'B',
+		 '7' : 'B', '8' : 'B', '9' : 'B', '10' : 'B', '11' : 'B', '12' : 'B', '13' : 'B', '14' : 'B',
+		 '15' : 'C-Alpha', '16' : 'N', '17' : 'O', '18' : 'C-Beta', '19' : 'H-Beta', '20' : 'C-Prime'}
+
+PDB_type = {'C-Alpha' : 'CA', 'N' : 'N', 'O' : 'O', 'C-Beta' : 'CB', 'H-Beta' : 'HB', 'C-Prime' : 'C', 'P' : 'P', 'S' : 'S'}
+element = {'C-Alpha' : 'C', 'N' : 'N', 'O' : 'O', 'C-Beta' : 'C', 'H-Beta' : 'H', 'C-Prime' : 'C', 'P' : 'P', 'S' : 'C', 'B' : 'C'}
+
+d_res = {"C" : "CYS", "I" : "ILE", "S" : "SER", "Q" : "GLN", "K" : "LYS",
+	 "N" : "ASN", "P" : "PRO", "T" : "THR", "F" : "PHE", "A" : "ALA",
+	 "H" : "HIS", "G" : "GLY", "D" : "ASP", "L" : "LEU", "R" : "ARG",
+	 "W" : "TRP", "V" : "VAL", "E" : "GLU", "Y" : "TYR", "M" : "MET"}
+
+dna_res = {"A" : "DA", "T" : "DT", "C" : "DC", "G" : "DG"}
+
+chain_letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+
+class PDB_Atom:
+	no = 0
+	ty = ''
+	res = 'UNK'
+	chain = 'A'
+	res_no = 0
+	atm = 'C'
+	seg = 'PROT'
+
+	def __init__(self, no, ty, res, chain, res_no, atm, seg='PROT'):
+		self.no = no
+		self.ty = ty
+		self.res = res
+		self.chain = chain
+		self.res_no = res_no
+		self.atm = atm
+		self.seg = seg
+
+def read_frame_coordinates(A, lines):
+	"""Parse the ATOMS lines (id type xs ys zs ...) of one dump frame.
+	Returns atom types and unscaled coordinates, both sorted by atom id."""
+	data = np.array(' '.join(lines).split(), dtype=float).reshape(len(lines), -1)
+	data = data[np.argsort(data[:,0], kind='mergesort')]
+	A = np.array(A, dtype=float)
+	coords = (A[:,1] - A[:,0])*data[:,2:5] + A[:,0]
+	return data[:,1].astype(int), coords
+
+def recover_N_terminal_atoms(Ca, Cp, O):
+	# Arrays of positions, shape (..., 3)
+	r = rNCa
+	psi = psi_NCaCp
+	theta = -theta_NCaCpO
+
+	v1 = Cp - O
+	mz = Cp - Ca
+	my = np.cross(v1, mz)
+	mx = np.cross(my, mz)
+
+	mx = mx*(r*np.sin(psi)*np.cos(theta)/np.sqrt((mx*mx).sum(-1)))[...,None]
+	my = my*(r*np.sin(psi)*np.sin(theta)/np.sqrt((my*my).sum(-1)))[...,None]
+	mz = mz*(r*np.cos(psi)/np.sqrt((mz*mz).sum(-1)))[...,None]
+
+	return Ca + mx + my + mz
+
+def recover_C_terminal_atoms(Ca, N, O):
+	# Arrays of positions, shape (..., 3)
+	sign = 1 # 1 or -1
+	r1 = rNCa
+	r2 = rCaCp
+	r3 = rCpO
+	psi1 = psi_NCaCp
+
+	xn = N - Ca
+	xo = O - Ca
+
+	ro_sq = (xo*xo).sum(-1)
+	ro = np.sqrt(ro_sq)
+	rn_sq = (xn*xn).sum(-1)
+	r1o = (xn*xo).sum(-1)
+	A = r1*r2*np.cos(psi1)*np.ones_like(ro)
+	B = ro_sq + r2*r2 - r3*r3
+	T1 = xn[...,1]*xn[...,1] + xn[...,2]*xn[...,2]
+	T2 = xo[...,1]*xo[...,1] + xo[...,2]*xo[...,2]
+	T3 = xn[...,1]*xo[...,1] + xn[...,2]*xo[...,2]
+	T4 = xn[...,2]*xo[...,1] - xn[...,1]*xo[...,2]
+	T5 = xn[...,0]*xo[...,2] - xn[...,2]*xo[...,0]
+	T6 = xn[...,0]*xo[...,1] - xn[...,1]*xo[...,0]
+
+	cprod = np.cross(xn, xo)
+	cprod_sq = (cprod*cprod).sum(-1)
+
+	D = cprod_sq*r2*r2 - A*A*ro_sq - 0.25*B*B*rn_sq + A*B*r1o
+
+	# If D<0 reduce the angle psi1 by changing A and B
+	neg = D<0
+	if neg.any():
+		largeB = neg & (np.abs(B)>2.0*ro*r2)
+		smallB = neg & ~largeB
+		B = np.where(largeB, 2.0*ro*r2, B)
+		A = np.where(largeB, B*r1o/ro_sq, A)
+		A = np.where(smallB, 0.5*( B*r1o + np.sqrt(np.maximum(cprod_sq*(4.0*ro_sq*r2*r2 - B*B), 0.0)) ) / ro_sq, A)
+		D = np.where(neg, 0.0, D)
+
+	px = ( A*( -xo[...,0]*T3 + xn[...,0]*T2 ) + 0.5*B*(xo[...,0]*T1 - xn[...,0]*T3) + sign*T4*np.sqrt(D) ) / cprod_sq
+	py = ( -A*xo[...,2] + 0.5*B*xn[...,2] + px*T5 ) / T4
+	pz = ( A*xo[...,1] - 0.5*B*xn[...,1] - px*T6 ) / T4
+
+	return Ca + np.stack((px, py, pz), -1)
+
+class Topology:
+	"""Reconstruction topology of one AWSEM (and 3SPN2 DNA) system.
+
+	types are the LAMMPS atom types of the frame atoms sorted by id,
+	protein_seqs the one letter sequences of the protein chains (None
+	for a single chain of unknown sequence), atom_desc maps atom types
+	to site descriptions. DNA sites (P, S, B) are passed through, a new
+	DNA chain starts at every nucleotide without a phosphate. dna_atoms
+	optionally replaces the generated DNA records by PDB_Atom-like
+	records read from a template, dna_bonds the generated DNA bonds
+	by pairs of 1-based DNA site indexes."""
+
+	def __init__(self, types, protein_seqs=None, atom_desc=protein_atom_desc, build_terminal_atoms=False,
+		     chain_res_numbering=False, dna_atoms=None, dna_bonds=None):
+		ca = []
+		o = []
+		cb = []
+		cb_desc = []
+		dna_sites = []
+		for i in range(len(types)):
+			t = str(types[i])
+			if t not in atom_desc:
+				sys.exit("Error! unknown atom type %s!" % t)
+			desc = atom_desc[t]
+			if desc == 'C-Alpha':
+				ca.append(i)
+				o.append(-1)
+				cb.append(-1)
+				cb_desc.append('')
+			elif desc == 'O' or desc == 'C-Beta' or desc == 'H-Beta':
+				if len(ca)==0:
+					sys.exit("Error! %s atom before the first Ca atom!" % desc)
+				if desc == 'O':
+					o[-1] = i
+				else:
+					cb[-1] = i
+					cb_desc[-1] = desc
+			elif desc in ['P', 'S', 'B']:
+				dna_sites.append([i, desc, int(t)])
+		nres = len(ca)
+
+		if protein_seqs is None: protein_seqs = ['A'*nres]
+		seq_all = ''.join(protein_seqs)
+		if len(seq_all)!=nres:
+			sys.exit("Error! atom list and sequance file size mismatch!\n")
+		for i in range(nres):
+			if o[i]==-1: sys.exit("Error! missing O atom in residue %d!\n" % (i+1))
+			if cb[i]==-1: sys.exit("Error! missing Cb or Hb atom in residue %d!\n" % (i+1))
+
+		chain = []
+		first_res = []
+		last_res = []
+		for ich in range(len(protein_seqs)):
+			if len(protein_seqs[ich])==0: continue
+			first_res.append(len(chain))
+			chain += [ich]*len(protein_seqs[ich])
+			last_res.append(len(chain)-1)
+		same_next = [i<nres-1 and chain[i]==chain[i+1] for i in range(nres)]
+
+		has_N = [i>0 and same_next[i-1] for i in range(nres)]
+		has_Cp = list(same_next)
+		if build_terminal_atoms:
+			for ifr, ila in zip(first_res, last_res):
+				if ifr!=ila:
+					has_N[ifr] = True
+					has_Cp[ila] = True
+
+		# Output order within a residue is N, CA, C', O, CB/HB
+		self.atoms = []
+		N_out = [-1]*nres
+		Cp_out = [-1]*nres
+		Ca_out = [-1]*nres
+		O_out = [-1]*nres
+		Cb_out = [-1]*nres
+		copy_src = []
+		copy_dst = []
+		res_no = 0
+		for i in range(nres):
+			if chain_res_numbering and i in first_res: res_no = 0
+			res_no += 1
+			ch = chain_letters[chain[i] % len(chain_letters)]
+			res = d_res.get(seq_all[i], "ALA")
+			residue = [['N', -1], ['C-Alpha', ca[i]], ['C-Prime', -1], ['O', o[i]], [cb_desc[i], cb[i]]]
+			for desc, src in residue:
+				if desc == 'N' and not has_N[i]: continue
+				if desc == 'C-Prime' and not has_Cp[i]: continue
+				index = len(self.atoms)
+				self.atoms.append(PDB_Atom(index+1, PDB_type[desc], res, ch, res_no, element[desc]))
+				if src!=-1:
+					copy_src.append(src)
+					copy_dst.append(index)
+				if desc == 'N': N_out[i] = index
+				elif desc == 'C-Alpha': Ca_out[i] = index
+				elif desc == 'C-Prime': Cp_out[i] = index
+				elif desc == 'O': O_out[i] = index
+				else: Cb_out[i] = index
+		self.nprotein = len(self.atoms)
+
+		self.bonds = []
+		for i in range(nres):
+			if N_out[i]!=-1: self.bonds.append([N_out[i]+1, Ca_out[i]+1])
+			if Cp_out[i]!=-1:
+				self.bonds.append([Ca_out[i]+1, Cp_out[i]+1])
+				self.bonds.append([Cp_out[i]+1, O_out[i]+1])
+			self.bonds.append([Ca_out[i]+1, Cb_out[i]+1])
+			if Cp_out[i]!=-1 and same_next[i]: self.bonds.append([Cp_out[i]+1, N_out[i+1]+1])
+
+		inner = [i for i in range(nres) if same_next[i]]
+		self.ca_i = np.array([ca[i] for i in inner], dtype=int)
+		self.ca_i1 = np.array([ca[i+1] for i in inner], dtype=int)
+		self.o_i = np.array([o[i] for i in inner], dtype=int)
+		self.n_dst = np.array([N_out[i+1] for i in inner], dtype=int)
+		self.cp_dst = np.array([Cp_out[i] for i in inner], dtype=int)
+
+		nterm = []
+		cterm = []
+		if build_terminal_atoms:
+			nterm = [i for i in first_res if has_N[i] and not (i>0 and same_next[i-1])]
+			cterm = [i for i in last_res if has_Cp[i] and not same_next[i]]
+		self.tn_dst = np.array([N_out[i] for i in nterm], dtype=int)
+		self.tn_ca = np.array([ca[i] for i in nterm], dtype=int)
+		self.tn_cp = np.array([Cp_out[i] for i in nterm], dtype=int)
+		self.tn_o = np.array([o[i] for i in nterm], dtype=int)
+		self.tc_dst = np.array([Cp_out[i] for i in cterm], dtype=int)
+		self.tc_ca = np.array([ca[i] for i in cterm], dtype=int)
+		self.tc_n = np.array([N_out[i] for i in cterm], dtype=int)
+		self.tc_o = np.array([o[i] for i in cterm], dtype=int)
+
+		# DNA sites, a nucleotide starts with P, or with S at the 5' end
+		self.ndna = len(dna_sites)
+		nt_res = None
+		nt_has_S = False
+		ich = len(protein_seqs) - 1
+		sites = []
+		for src, desc, t in dna_sites:
+			if desc == 'P' or (desc == 'S' and nt_has_S) or nt_res is None:
+				if desc == 'S' or nt_res is None:
+					ich += 1
+					if chain_res_numbering: res_no = 0
+				res_no += 1
+				nt_res = res_no
+				nt_has_S = False
+				sites.append([])
+			if desc == 'S': nt_has_S = True
+			sites[-1].append([src, desc, t, nt_res, ich])
+		nt_index = []
+		for nt in sites:
+			base = 'N'
+			for src, desc, t, r, ich in nt:
+				if desc == 'B': base = 'ATGC'[(t-3)%4]
+			index = {}
+			for src, desc, t, r, ich in nt:
+				k = len(self.atoms)
+				ch = chain_letters[ich % len(chain_letters)]
+				self.atoms.append(PDB_Atom(k+1, PDB_type.get(desc, base), dna_res.get(base, "DN"), ch, r, element[desc], 'DNA'))
+				copy_src.append(src)
+				copy_dst.append(k)
+				index[desc] = k+1
+			nt_index.append([nt[0][4], index])
+
+		if dna_bonds is None:
+			last_S = -1
+			last_chain = -1
+			for ich, index in nt_index:
+				if 'P' in index and last_S!=-1 and ich==last_chain: self.bonds.append([last_S, index['P']])
+				if 'P' in index and 'S' in index: self.bonds.append([index['P'], index['S']])
+				if 'S' in index and 'B' in index: self.bonds.append([index['S'], index['B']])
+				last_S = index.get('S', -1)
+				last_chain = ich
+		else:
+			self.bonds += [[ib[0]+self.nprotein, ib[1]+self.nprotein] for ib in dna_bonds]
+
+		if dna_atoms is not None:
+			if len(dna_atoms)!=self.ndna:
+				sys.exit("Error! DNA template has %d atoms, dump file has %d DNA sites!\n" % (len(dna_atoms), self.ndna))
+			for k in range(self.ndna):
+				ta = dna_atoms[k]
+				self.atoms[self.nprotein+k] = PDB_Atom(self.nprotein+k+1, ta.ty, ta.res, ta.chain, ta.res_no, ta.atm, 'DNA')
+
+		self.copy_src = np.array(copy_src, dtype=int)
+		self.copy_dst = np.array(copy_dst, dtype=int)
+		self.natoms_in = len(types)
+		self.ndna_res = len(sites)
+		self.natoms = len(self.atoms)
+		self.nres = nres
+
+	def build(self, coords):
+		"""coords are the dump positions sorted by atom id, with shape
+		(natoms_in, 3) or (nframes, natoms_in, 3). Returns the positions
+		of all atoms of the topology in output order."""
+		X = np.asarray(coords, dtype=float)
+		out = np.empty(X.shape[:-2] + (self.natoms, 3))
+		out[...,self.copy_dst,:] = X[...,self.copy_src,:]
+		Cai = X[...,self.ca_i,:]
+		Cai1 = X[...,self.ca_i1,:]
+		Oi = X[...,self.o_i,:]
+		out[...,self.n_dst,:] = an*Cai + bn*Cai1 + cn*Oi
+		out[...,self.cp_dst,:] = ap*Cai + bp*Cai1 + cp*Oi
+		if len(self.tn_dst)>0:
+			out[...,self.tn_dst,:] = recover_N_terminal_atoms(X[...,self.tn_ca,:], out[...,self.tn_cp,:], X[...,self.tn_o,:])
+		if len(self.tc_dst)>0:
+			out[...,self.tc_dst,:] = recover_C_terminal_atoms(X[...,self.tc_ca,:], out[...,self.tc_n,:], X[...,self.tc_o,:])
+		return out
@@ -11,6 +11,7 @@
 
 i_model = 0
 import sys
+from PdbWriterLib import PDBTemplate
 
 #from Bio.PDB.PDBParser import PDBParser
 
@@ -155,6 +156,7 @@ atoms3 = []
 bonds = []
 box = []
 A = []
+pdb_template = None
 
 out = open(output_file, 'w')
 
@@ -274,12 +276,14 @@ def print_atom_array():
 		ia.write_(out)
 
 def print_pdb():
-	global i_model
+	# The topology is the same for every frame, so atoms3 is only
+	# built once and later frames just format new coordinates
+	global i_model, pdb_template
 	i_model+=1
-	out.write('MODEL        '+str(i_model)+'\n')
-	for ia in atoms3:
-		ia.write_(out)
-	out.write("ENDMDL\n");
+	if pdb_template is None:
+		convertToPDB()
+		pdb_template = PDBTemplate(atoms3)
+	pdb_template.write_model(out, atoms2, i_model)
 
 def print_psf():
 	space8 = "        "
@@ -313,13 +317,11 @@ if snapshot<0:
 			if item == "TIMESTEP":
 				if len(atoms)>0:
 					buildAllAtoms()
-					convertToPDB()
 					n_atoms = len(atoms2)
 					print_pdb()
 				step = int(l)
 				atoms = []
 				atoms2 = []
-				atoms3 = []
 				box = []
 				A = []
 				nFrame = nFrame + 1
@@ -344,7 +346,6 @@ if snapshot<0:
 	
 	if len(atoms)>0:
 		buildAllAtoms()
-		convertToPDB()
 		n_atoms = len(atoms2)
 		print_pdb()
 		buildBonds()
@@ -381,7 +382,6 @@ else:
 				atoms.append(atom)
 	if len(atoms)>0:
 		buildAllAtoms()
-		convertToPDB()
 		n_atoms = len(atoms2)
 		print_pdb()
 		buildBonds()
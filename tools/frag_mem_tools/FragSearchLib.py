@@ -0,0 +1,186 @@
+# ----------------------------------------------------------------------
+# PSI-BLAST searches of the sliding window fragments of a sequence.
+#
+# The windows are written as one multi-FASTA query file, window i with
+# the id w<i>, and searched with a single psiblast run (or a few runs of
+# windowsPerSearch windows), so the database is loaded once instead of
+# once per window. The hits are sorted back to their windows by the
+# query id, which is put in front of the requested output fields and
+# removed again, so every window gets the same lines as a search of the
+# window alone.
+#
+# The runs can be spread over a pool of worker processes, each psiblast
+# run using threads threads. Every run writes its own temporary query
+# file, so several searches can share a working directory, and the hits
+# are merged by window, independent of the order the runs finish in.
+#
+# Hits can be kept in an sqlite file shared by all runs, keyed by the
+# database (its path and the time and size of its files), fragment
+# sequence, E-value, matrix and output fields. Only fragments missing
+# from it are searched, so a point mutant needs just the windows that
+# cover the mutation. Fragments occurring in several windows are
+# searched once. Only fragments of successful runs are stored, each
+# behind a "#searched" line, so a fragment without hits is told apart
+# from one that was never searched; rows without it are searched again.
+# -------------------------------------------------------------------------
+
+import os
+import sys
+import glob
+import sqlite3
+import tempfile
+import subprocess
+from multiprocessing import Pool
+
+def windowQueries(seq, fragmentLength):
+	# (window number counted from 1, fragment sequence) of all sliding windows of seq
+	seq = str(seq)
+	return [(i, seq[i-1:i-1+fragmentLength]) for i in range(1, len(seq)-fragmentLength+2)]
+
+def writeQueryFile(queries, query_file):
+	out = open(query_file, 'w')
+	for window, subrange in queries:
+		out.write(">w"+str(window)+"\n"+subrange+"\n")
+	out.close()
+
+def psiblastCommand(database, query_file, evalue, fields, matrix='BLOSUM62', threads=1):
+	exeline="psiblast -num_iterations 1 -word_size 2 -evalue "+str(evalue)
+	exeline+=" -outfmt '6 qseqid "+fields+"' -matrix "+matrix+" -db "
+	exeline+=database+" -query "+query_file+" -num_threads "+str(threads)
+	return exeline
+
+def splitHits(queries, psiblastOut):
+	# psiblast output lines of a run over queries, sorted by window and without the query id.
+	# Depending on the BLAST+ version the ids come out as w<i>, lcl|w<i> or Query_<n>
+	windows = {}
+	for n in range(len(queries)):
+		windows["w"+str(queries[n][0])] = queries[n][0]
+		windows["Query_"+str(n+1)] = queries[n][0]
+	hits = dict([(window, []) for window, subrange in queries])
+	for line in psiblastOut:
+		fields = line.split(None, 1)
+		if len(fields) < 2: continue
+		qseqid = fields[0]
+		if qseqid[0:4] == "lcl|": qseqid = qseqid[4:]
+		if not windows.has_key(qseqid):
+			raise ValueError("Unexpected query id in psiblast output: "+fields[0])
+		hits[windows[qseqid]].append(fields[1])
+	return hits
+
+def searchChunk(args):
+	# one psiblast run over a list of queries, from a private query file.
+	# Runs in the pool workers as well, so it only returns the command and the hits.
+	# A failed run raises a RuntimeError with its stderr, instead of looking like no hits
+	database, queries, evalue, fields, matrix, threads = args
+	fd, query_file = tempfile.mkstemp(prefix='fragments', suffix='.fasta')
+	os.close(fd)
+	try:
+		writeQueryFile(queries, query_file)
+		exeline = psiblastCommand(database, query_file, evalue, fields, matrix, threads)
+		process = subprocess.Popen(exeline, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		psiblastOut, psiblastErr = process.communicate()
+		if process.returncode != 0:
+			raise RuntimeError("psiblast exited with status "+str(process.returncode)+": "+exeline+"\n"+psiblastErr.strip())
+	finally:
+		os.remove(query_file)
+	return exeline, splitHits(queries, psiblastOut.splitlines())
+
+def tryChunk(args):
+	# searchChunk returning (command, hits, error) instead of raising, so the
+	# hits of the other runs of a pool are kept when one of them fails
+	try:
+		exeline, hits = searchChunk(args)
+		return exeline, hits, None
+	except RuntimeError as e:
+		return None, None, str(e)
+
+def databaseKey(database):
+	# path of the database and the newest time and total size of its files,
+	# so hits of a rebuilt database are not taken from the cache
+	database = os.path.abspath(database)
+	files = glob.glob(database+".*")
+	stamp = max([0]+[int(os.path.getmtime(f)) for f in files])
+	size = sum([os.path.getsize(f) for f in files])
+	return database+" "+str(stamp)+" "+str(size)
+
+SEARCHED = "#searched"
+
+class HitCache:
+	def __init__(self, cache_file, database, evalue, fields, matrix='BLOSUM62'):
+		directory = os.path.dirname(cache_file)
+		if directory != '' and not os.path.exists(directory): os.makedirs(directory)
+		self.connection = sqlite3.connect(cache_file, timeout=600)
+		self.connection.execute("create table if not exists hits (db text, fragment text, evalue text, matrix text, fields text, lines text, primary key (db, fragment, evalue, matrix, fields))")
+		self.connection.commit()
+		self.key = (databaseKey(database), str(evalue), matrix, fields)
+
+	def lookup(self, fragments):
+		# {fragment: output lines} of the fragments found in the cache. Rows
+		# not starting with the SEARCHED line are not trusted and left out
+		hits = {}
+		for fragment in set(fragments):
+			row = self.connection.execute("select lines from hits where db=? and fragment=? and evalue=? and matrix=? and fields=?", (self.key[0], fragment)+self.key[1:]).fetchone()
+			if row is None: continue
+			lines = str(row[0]).split("\n")
+			if lines[0] == SEARCHED:
+				hits[fragment] = [line for line in lines[1:] if line != ""]
+		return hits
+
+	def store(self, hits):
+		# hits {fragment: output lines} of searched fragments, stored behind the SEARCHED line
+		self.connection.executemany("insert or replace into hits values (?, ?, ?, ?, ?, ?)", [(self.key[0], fragment)+self.key[1:]+("\n".join([SEARCHED]+lines),) for fragment, lines in hits.items()])
+		self.connection.commit()
+
+	def close(self):
+		self.connection.close()
+
+def searchWindows(database, queries, evalue, fields, matrix='BLOSUM62', windowsPerSearch=0, processes=1, threads=1, cache_file=''):
+	# hits {window: output lines} of the (window, fragment) queries. Every fragment is searched
+	# once, and only if it is not in the cache_file yet. The searched windows are split
+	# in runs of windowsPerSearch windows, or evenly over the processes if it is 0,
+	# and the runs are done by a pool of processes workers. If a run fails, the hits
+	# of the successful ones are cached and the program exits with the error
+	cache = None
+	known = {}
+	if cache_file != '':
+		cache = HitCache(cache_file, database, evalue, fields, matrix)
+		known = cache.lookup([subrange for window, subrange in queries])
+	searched = []
+	fragments = set(known.keys())
+	for window, subrange in queries:
+		if subrange not in fragments:
+			searched.append((window, subrange))
+			fragments.add(subrange)
+	print "windows:", len(queries), "cached fragments:", len(known), "searched fragments:", len(searched)
+
+	if windowsPerSearch <= 0: windowsPerSearch = max(1, -(-len(searched)/max(1, processes)))
+	chunks = [(database, searched[start:start+windowsPerSearch], evalue, fields, matrix, threads) for start in range(0, len(searched), windowsPerSearch)]
+	if processes > 1 and len(chunks) > 1:
+		pool = Pool(min(processes, len(chunks)))
+		results = pool.map(tryChunk, chunks)
+		pool.close()
+		pool.join()
+	else:
+		results = map(tryChunk, chunks)
+	found = {}
+	errors = []
+	for exeline, chunkHits, error in results:
+		if error is not None:
+			errors.append(error)
+			continue
+		print "executing:::"+exeline
+		found.update(chunkHits)
+	new = dict([(subrange, found[window]) for window, subrange in searched if found.has_key(window)])
+	if cache is not None:
+		cache.store(new)
+		cache.close()
+	if len(errors) > 0:
+		sys.exit("Error! "+str(len(errors))+" of "+str(len(chunks))+" psiblast runs failed:\n"+"\n".join(errors))
+	known.update(new)
+	return dict([(window, list(known[subrange])) for window, subrange in queries])
+
+def searchSequence(database, seq, evalue, fields, matrix='BLOSUM62', threads=1):
+	# output lines of a psiblast search of the whole sequence seq
+	exeline, hits = searchChunk((database, [(0, str(seq))], evalue, fields, matrix, threads))
+	print "executing:::"+exeline
+	return hits[0]
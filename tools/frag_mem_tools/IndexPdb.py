@@ -17,6 +17,7 @@
 
 from Bio import pairwise2
 from Bio.PDB.PDBParser import PDBParser
+from Bio.PDB.Structure import Structure
 from Bio import SeqIO
 
 def three2one(prot): 
@@ -70,13 +71,23 @@ def getFastaSequance(fasta_file):
 	
 	return str(inseq.seq)
 
+def pdbName(pdb_file):
+	# name of a pdb file name, open file or parsed structure, for messages
+	if isinstance(pdb_file, Structure):
+		return pdb_file.get_id()
+	return getattr(pdb_file, 'name', pdb_file)[0:-4]
+
 def getPdbSequance(pdb_file, chain_id):
 	pdb_indexes = []
 	pdb_sequance = []
 
-	p = PDBParser(PERMISSIVE=1)
-	s = p.get_structure("",  pdb_file)
-	pdb_id = pdb_file[0:-4]
+	if isinstance(pdb_file, Structure):
+		# already parsed, e.g. by a PdbStoreLib StructureCache
+		s = pdb_file
+	else:
+		p = PDBParser(PERMISSIVE=1)
+		s = p.get_structure("",  pdb_file)
+	pdb_id = pdbName(pdb_file)
 	
 	if not s[0].has_id(chain_id):
 		print "PDB "+pdb_id+" doesn't have chain with id "+chain_id
@@ -125,7 +136,7 @@ def writeIndexFile(fasta_file, pdb_file, index_file, chain_id):
 #	from Bio.PDB.PDBParser import PDBParser
 #	from Bio import SeqIO
 
-	pdb_id = pdb_file[0:-4]
+	pdb_id = pdbName(pdb_file)
 
 #fasta_file = sys.argv[1]
 #pdb_id = sys.argv[2]
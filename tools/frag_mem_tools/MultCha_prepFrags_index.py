@@ -17,6 +17,9 @@
 import sys,os,re
 from IndexPdb import *
 from Pdb2GroLib import *
+from FragSearchLib import *
+from PdbStoreLib import *
+from multiprocessing import cpu_count
 from Bio.PDB.Polypeptide import * #func three_to_one()
 from Bio import SeqIO
 import operator
@@ -45,6 +48,7 @@ weight=1 #feature in match file
 
 myhome  = os.environ.get("HOME")
 pdbDir  = myhome + "/opt/script/PDBs/"
+pdbMirror = os.environ.get("PDB_MIRROR", "") #local gzipped mirror of the divided PDB layout, without it PDBs are downloaded to pdbDir
 #fLibDir = "./fraglib/"
 indexDir = myhome + "/opt/script/Indices/"
 fLibDir = myhome + "/opt/script/fraglib/"
@@ -69,6 +73,10 @@ seq_records = SeqIO.index(fasta_database, "fasta")
 handle = open(fasta, "rU")
 memoriesPerPosition=N_mem  #can be any integer > 0
 EvalueThreshold=15000 #needs to be large enough that PSI-BLAST returns at least memoriesPerPosition
+windowsPerSearch=0 #windows per PSI-BLAST run, 0 spreads the windows evenly over the searchProcesses runs
+searchProcesses=cpu_count() #PSI-BLAST runs at the same time
+searchThreads=1 #threads of every PSI-BLAST run (-num_threads)
+searchCache=myhome+"/opt/script/psiblast_hits.sqlite" #cache of PSI-BLAST hits by fragment, '' to always search
 ##SANITY CHECKING
 #is length greater than fragmentLength?
 ##Create necessary directories
@@ -78,6 +86,8 @@ if not os.path.exists(fLibDir): os.makedirs(fLibDir)
 if not os.path.exists(pdbDir) or not os.path.exists(fLibDir) or not os.path.exists(indexDir) :
     print "Can't create necessary directories"
     sys.exit()
+pdbStore=openPdbStore(pdbDir, pdbMirror)
+templates=StructureCache(pdbStore) #parsed template PDBs, shared by the index and .gro steps
 
 LAMWmatch=open('fragsLAMW.mem','w')
 LAMWmatch.write('[Target]'+"\n")
@@ -98,6 +108,10 @@ for record in SeqIO.parse(handle, "fasta"): #loop1
     match.write(query+"\n")
     ##FRAGMENT GENERATION LOOP
     iterations=len(record.seq)-fragmentLength+1 #number of sliding windows
+    ##submit PSI-BLAST for all windows together, hits are sorted back to the windows
+    ##run "psiblast -help" for more details of output format (outfmt)
+    queries=windowQueries(record.seq, fragmentLength)
+    windowHits=searchWindows(database, queries, EvalueThreshold, "sseqid qstart qend sstart send qseq sseq length gaps bitscore evalue", "BLOSUM62", windowsPerSearch, searchProcesses, searchThreads, searchCache)
     
     for i in range(1,iterations+1): #loop2
         ##select subrange
@@ -105,19 +119,8 @@ for record in SeqIO.parse(handle, "fasta"): #loop1
         rangeStart=i-1
         rangeEnd=i+fragmentLength-1
         subrange=str(record[rangeStart:rangeEnd].seq)
-    
-        fragment=open('fragment.fasta','w')
         print "fragment subrange:::"+subrange
-        fragment.write(subrange)
-        fragment.close()
-        ##submit PSI-BLAST
-        ##run "psiblast -help" for more details of output format (outfmt)
-        exeline="psiblast -num_iterations 1 -word_size 2 -evalue "+str(EvalueThreshold)
-        exeline+=" -outfmt '6 sseqid qstart qend sstart send qseq sseq length gaps bitscore evalue' -matrix BLOSUM62 -db "
-        exeline+=database+" -query fragment.fasta"
-        print "executing:::"+exeline
-        psiblastOut=os.popen(exeline).read()
-        psiblastOut=psiblastOut.splitlines() #now an array
+        psiblastOut=windowHits[i]
         N_blast=len(psiblastOut)
         print "Number of searched PDBs:  ", N_blast
         #print psiblastOut
@@ -185,39 +188,22 @@ for record in SeqIO.parse(handle, "fasta"): #loop1
 	#atomLine=re.compile('\AATOM') 
     #Finding homologs
     print record.seq
-    fragment=open('fragment.fasta','w')
-    fragment.write(str(record.seq))
-    fragment.close()
     homo={} 
     failed_pdb = {}
     
     for pdbfull in unique:
         pdbID=pdbfull[0:4].lower()
-        pdbIDsecond=pdbfull[1:2].lower()
-        pdbIDthird=pdbfull[2:3].lower()
         chainID=pdbfull[4:5].lower()
         failed_pdb[pdbID] = 0
         homo[pdbID] = 0
-        if not os.path.isfile(pdbDir+pdbID.upper()+".pdb"):
-        ##from script 'pdbget' (original author unknown)
-            exeline="wget ftp://ftp.wwpdb.org/pub/pdb/data/structures/divided/pdb/"
-            exeline+=pdbIDsecond+pdbIDthird+"/pdb"+pdbID+".ent.gz"
-            os.system(exeline);
-            os.system("nice gunzip pdb"+pdbID+".ent.gz; mv pdb"+pdbID+".ent "+pdbDir+pdbID.upper()+".pdb");
-    
-        if not os.path.isfile(pdbDir+pdbID.upper()+".pdb"):
+        if not pdbStore.available(pdbID):
             print ":::Cannot build PDB for PDB ID, failed to download:"+pdbID.upper()
             failed_pdb[pdbID] = 1        
         
     if brain_damage == 1:
     # blast the whole sequence to identify homologs Evalue 0.005 
-        exeline="psiblast -num_iterations 1 -word_size 2 -evalue 0.005"
-        exeline+=" -outfmt '6 sseqid slen bitscore score evalue' -matrix BLOSUM62 -db "
-        exeline+=database+" -query fragment.fasta"
         print "brain damamge, finding homologs"
-        print "executing::: "+exeline
-        homoOut=os.popen(exeline).read()
-        homoOut=homoOut.splitlines() #now an array
+        homoOut=searchSequence(database, record.seq, 0.005, "sseqid slen bitscore score evalue", "BLOSUM62", searchThreads)
         for line in homoOut:
             entries=line.split()
             print "homologues: ", entries
@@ -251,7 +237,7 @@ for record in SeqIO.parse(handle, "fasta"): #loop1
             chainID=pdbfull[4:5].lower()
             groFile=fLibDir+pdbID+chainID+".gro"
             groName=pdbID+chainID+".gro"
-            pdbFile=pdbDir+pdbID.upper()+".pdb"    
+            pdbFile=pdbStore.path(pdbID)
             indexFile=indexDir+pdbID+chainID+".index"
         
             if failed_pdb[pdbID]:#failed-downloaded ones are still in matchlines, need to be ignored
@@ -289,7 +275,7 @@ for record in SeqIO.parse(handle, "fasta"): #loop1
                 #write index file
                 if os.path.getsize('tmp.fasta') > 0 :
                     print "Writing indexFile: ", indexFile
-                    writeIndexFile(fastFile, pdbFile, indexFile, chainID.upper())
+                    writeIndexFile(fastFile, templates.structure(pdbID), indexFile, chainID.upper())
             else :
                 print indexFile, "exist, no need to create."
     
@@ -368,10 +354,10 @@ for record in SeqIO.parse(handle, "fasta"): #loop1
                 Missing_count += 1
                 continue
     
-            if os.path.isfile(pdbFile): 
+            if pdbStore.available(pdbID): 
                 if not os.path.isfile(groFile) :
                     print "converting...... "+pdbFile+" --> "+groFile
-                    Pdb2Gro(pdbFile, groFile, chainID.upper())
+                    Pdb2Gro(templates.structure(pdbID), groFile, chainID.upper())
                 else :
                     print "Exist "+groFile
                 count[windows_index_str] += 1
@@ -407,4 +393,5 @@ for record in SeqIO.parse(handle, "fasta"): #loop1
     print "Number of failed downloaded PDB: ", sum(failed_pdb.values())
     print "Number of PDB with Missing atoms: ", len(Missing_pdb)
     print "Discarded fragments with Missing atoms: ", Missing_count
+    print "Number of parsed template PDBs: ", templates.parsed
     residue_base += len(record.seq)
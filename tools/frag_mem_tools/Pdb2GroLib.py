@@ -51,18 +51,27 @@ class Atom:
 
 def Pdb2Gro(pdb_file, gro_file, ch_name):
 	from Bio.PDB.PDBParser import PDBParser
+	from Bio.PDB.Structure import Structure
 
 	p = PDBParser(PERMISSIVE=1)
 
-	pdb_id = pdb_file 
-	if pdb_file[-4:].lower()!=".pdb":
-		pdb_file = pdb_file + ".pdb"
-	if pdb_id[-4:].lower()==".pdb":
-		pdb_id = pdb_id[:-4]
+	if hasattr(pdb_file, 'read'):
+		# an open file, e.g. from a PdbStoreLib store
+		pdb_id = pdb_file.name
+	elif not isinstance(pdb_file, Structure):
+		pdb_id = pdb_file 
+		if pdb_file[-4:].lower()!=".pdb":
+			pdb_file = pdb_file + ".pdb"
+		if pdb_id[-4:].lower()==".pdb":
+			pdb_id = pdb_id[:-4]
 	
 	output = gro_file
 	
-	s = p.get_structure(pdb_id, pdb_file)
+	if isinstance(pdb_file, Structure):
+		# already parsed, e.g. by a PdbStoreLib StructureCache
+		s = pdb_file
+	else:
+		s = p.get_structure(pdb_id, pdb_file)
 	chains = s[0].get_list()
 	
 	if ch_name=='':
@@ -0,0 +1,120 @@
+# ----------------------------------------------------------------------
+# Stores of template PDB structures for the fragment memory scripts.
+#
+# PdbDirectoryStore keeps ID.pdb files in one directory and downloads
+# missing ones from the wwPDB with wget, as the scripts always did.
+# PdbMirrorStore reads a local mirror of the wwPDB divided layout
+# (xy/pdbwxyz.ent.gz, xy being the middle two characters of the ID)
+# without network access. The files are decompressed while they are
+# read, nothing is written to disk. The available IDs are listed in an
+# index file, by default pdbstore.index in the mirror, which is built on
+# first use and should be deleted after the mirror is updated.
+#
+# Both stores have the same methods: available(pdbID), open(pdbID),
+# which returns an open file that PDBParser, writeIndexFile() and
+# Pdb2Gro() accept in place of a file name, and path(pdbID) for messages.
+#
+# StructureCache keeps the parsed structures of the most recently used
+# templates of a store. writeIndexFile(), Pdb2Gro() and NoMissingAtoms()
+# also accept such a parsed structure, so a template used by many
+# fragments is parsed once per run.
+# -------------------------------------------------------------------------
+
+import os
+import gzip
+from collections import OrderedDict
+
+class PdbDirectoryStore:
+	def __init__(self, directory, download=True):
+		self.directory = directory
+		self.download = download
+
+	def path(self, pdbID):
+		return os.path.join(self.directory, pdbID.upper()+".pdb")
+
+	def available(self, pdbID):
+		if self.download and not os.path.isfile(self.path(pdbID)):
+			self.fetch(pdbID)
+		return os.path.isfile(self.path(pdbID))
+
+	def fetch(self, pdbID):
+		##from script 'pdbget' (original author unknown)
+		pdbID = pdbID.lower()
+		exeline="wget ftp://ftp.wwpdb.org/pub/pdb/data/structures/divided/pdb/"
+		exeline+=pdbID[1:3]+"/pdb"+pdbID+".ent.gz"
+		os.system(exeline)
+		os.system("nice gunzip pdb"+pdbID+".ent.gz; mv pdb"+pdbID+".ent "+self.path(pdbID))
+
+	def open(self, pdbID):
+		return open(self.path(pdbID), 'r')
+
+class PdbMirrorStore:
+	def __init__(self, mirror, index_file=''):
+		self.mirror = mirror
+		if index_file == '':
+			index_file = os.path.join(mirror, "pdbstore.index")
+		self.index_file = index_file
+		if os.path.isfile(index_file):
+			self.ids = set(open(index_file, 'r').read().split())
+		else:
+			self.ids = self.buildIndex()
+
+	def path(self, pdbID):
+		pdbID = pdbID.lower()
+		return os.path.join(self.mirror, pdbID[1:3], "pdb"+pdbID+".ent.gz")
+
+	def buildIndex(self):
+		# IDs (upper case) of all files of the mirror, written to the index file if it can be
+		print "Indexing PDB mirror "+self.mirror+"..."
+		ids = set()
+		for subdir in os.listdir(self.mirror):
+			if not os.path.isdir(os.path.join(self.mirror, subdir)): continue
+			for name in os.listdir(os.path.join(self.mirror, subdir)):
+				if name[0:3] == "pdb" and name[-7:] == ".ent.gz":
+					ids.add(name[3:-7].upper())
+		try:
+			# written under a temporary name, so other runs never read half of it
+			tmp_file = self.index_file+"."+str(os.getpid())
+			out = open(tmp_file, 'w')
+			out.write("\n".join(sorted(ids))+"\n")
+			out.close()
+			os.rename(tmp_file, self.index_file)
+		except (IOError, OSError):
+			print "Cannot write the PDB index "+self.index_file+", it is kept in memory"
+		return ids
+
+	def available(self, pdbID):
+		return pdbID.upper() in self.ids
+
+	def open(self, pdbID):
+		return gzip.open(self.path(pdbID), 'rb')
+
+class StructureCache:
+	def __init__(self, store, size=64):
+		self.store = store
+		self.size = size
+		self.structures = OrderedDict()
+		self.parsed = 0
+		self.parser = None
+
+	def structure(self, pdbID):
+		# parsed structure of pdbID, from the cache if it is one of the size last used ones
+		pdbID = pdbID.upper()
+		if pdbID in self.structures:
+			s = self.structures.pop(pdbID)
+		else:
+			if self.parser is None:
+				from Bio.PDB.PDBParser import PDBParser
+				self.parser = PDBParser(PERMISSIVE=1)
+			s = self.parser.get_structure(pdbID, self.store.open(pdbID))
+			self.parsed += 1
+			if len(self.structures) >= self.size:
+				self.structures.popitem(last=False)
+		self.structures[pdbID] = s
+		return s
+
+def openPdbStore(pdbDir, mirror=''):
+	# the mirror if one is given, otherwise pdbDir with downloads
+	if mirror != '':
+		return PdbMirrorStore(mirror)
+	return PdbDirectoryStore(pdbDir)
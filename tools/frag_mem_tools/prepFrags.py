@@ -5,6 +5,8 @@
 #USAGE: prepFrags.py database-prefix file.fasta > logfile
 
 import sys,os
+from FragSearchLib import *
+from multiprocessing import cpu_count
 
 database=sys.argv[1]
 inFASTA=sys.argv[2]
@@ -18,6 +20,10 @@ print "processing: ",inseq.name
 fragmentLength=9 #needs to be an odd number
 memoriesPerPosition=10 #can be any integer > 0
 EvalueThreshold=10000 #needs to be large enough that PSI-BLAST returns at least memoriesPerPosition
+windowsPerSearch=0 #windows per PSI-BLAST run, 0 spreads the windows evenly over the searchProcesses runs
+searchProcesses=cpu_count() #PSI-BLAST runs at the same time
+searchThreads=1 #threads of every PSI-BLAST run (-num_threads)
+searchCache=os.environ.get("HOME")+"/opt/script/psiblast_hits.sqlite" #cache of PSI-BLAST hits by fragment, '' to always search
 #
 ##
 ##SANITY CHECKING
@@ -32,23 +38,17 @@ match=open('prepFrags.match','w')
 match.write(inseq.id+"\n")
 ##FRAGMENT GENERATION LOOP
 iterations=len(inseq.seq)-fragmentLength+1 #number of sliding window positions
+##submit PSI-BLAST for all windows together -- run psiblast -help for explanation of format 6 output
+##the fields are the standard ones of format 6, qseqid is the window id here
+queries=windowQueries(inseq.seq, fragmentLength)
+windowHits=searchWindows(database, queries, EvalueThreshold, "qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue bitscore", "BLOSUM62", windowsPerSearch, searchProcesses, searchThreads, searchCache)
 for i in range(1,iterations+1): 
 ##select subrange
     rangeStart=i-1
     rangeEnd=i+fragmentLength-1
     subrange=str(inseq[rangeStart:rangeEnd].seq)
-    fragment=open('/usr/tmp/fragment.fasta','w')
     print subrange
-    fragment.write(subrange)
-    fragment.close()
-##submit PSI-BLAST -- run psiblast -help for explanation of format 6 output
-#    exeline="psiblast -query_loc "+str(rangeStart)+"-"+str(rangeEnd)
-    exeline="psiblast -num_iterations 1 -word_size 2 -evalue "+str(EvalueThreshold)
-    exeline+=" -outfmt 6 -matrix BLOSUM62 -db "
-    exeline+=database+" -query /usr/tmp/fragment.fasta"
-    print exeline
-    psiblastOut=os.popen(exeline).read()
-    psiblastOut=psiblastOut.splitlines() #now an array
+    psiblastOut=windowHits[i]
 #column 7,8,9,10 (starting at 1) are the indices for the aligned ranges
     print "PDB INSEQ-START INSEQ-END MATCH-START MATCH-END EVALUE"
     for line in psiblastOut[0:memoriesPerPosition]:
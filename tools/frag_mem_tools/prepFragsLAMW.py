@@ -16,6 +16,9 @@
 
 import sys,os,re
 from Pdb2GroLib import *
+from FragSearchLib import *
+from PdbStoreLib import *
+from multiprocessing import cpu_count
 from Bio.PDB.Polypeptide import * #func three_to_one()
 
 if len(sys.argv)!=5:
@@ -31,8 +34,12 @@ if len(sys.argv)!=5:
 
 def NoMissingAtoms(atom_list, residue_list, res_Start, pdbID, ch_name, pdbFile):
 	res_End = res_Start + len(residue_list) - 1
-	p = PDBParser(PERMISSIVE=1)
-	s = p.get_structure(pdbID, pdbFile)
+	if isinstance(pdbFile, Structure):
+		# already parsed, e.g. by a PdbStoreLib StructureCache
+		s = pdbFile
+	else:
+		p = PDBParser(PERMISSIVE=1)
+		s = p.get_structure(pdbID, pdbFile)
 	chains = s[0].get_list()
 	if ch_name == '':
 		ch_name = "A" 
@@ -118,12 +125,17 @@ query=str(inseq.name)[0:4]
 
 myhome  = os.environ.get("HOME")
 pdbDir  = myhome + "/opt/script/PDBs/"
+pdbMirror = os.environ.get("PDB_MIRROR", "") #local gzipped mirror of the divided PDB layout, without it PDBs are downloaded to pdbDir
 fLibDir = "./fraglib/"
 #fLibDir = myhome + "/opt/script/fraglib/"
 
 fragmentLength=9 #needs to be an odd number
 memoriesPerPosition=N_mem  #can be any integer > 0
 EvalueThreshold=10000 #needs to be large enough that PSI-BLAST returns at least memoriesPerPosition
+windowsPerSearch=0 #windows per PSI-BLAST run, 0 spreads the windows evenly over the searchProcesses runs
+searchProcesses=cpu_count() #PSI-BLAST runs at the same time
+searchThreads=1 #threads of every PSI-BLAST run (-num_threads)
+searchCache=myhome+"/opt/script/psiblast_hits.sqlite" #cache of PSI-BLAST hits by fragment, '' to always search
 
 ##SANITY CHECKING
 #is length greater than fragmentLength?
@@ -138,6 +150,8 @@ if not os.path.exists(fLibDir): os.makedirs(fLibDir)
 if not os.path.exists(pdbDir) or not os.path.exists(fLibDir):
 	print "Can't create necessary directories"
 	sys.exit()
+pdbStore=openPdbStore(pdbDir, pdbMirror)
+templates=StructureCache(pdbStore) #parsed template PDBs, shared by the missing atom and .gro steps
 
 ##open match file
 match=open('prepFrags.match','w')
@@ -145,25 +159,19 @@ match.write(query+"\n")
 ##FRAGMENT GENERATION LOOP
 iterations=len(inseq.seq)-fragmentLength+1 #number of sliding windows
 
+##submit PSI-BLAST for all windows together, hits are sorted back to the windows
+##run "psiblast -help" for more details of output format (outfmt)
+queries=windowQueries(inseq.seq, fragmentLength)
+windowHits=searchWindows(database, queries, EvalueThreshold, "sseqid qstart qend sstart send qseq sseq length gaps bitscore evalue", "BLOSUM62", windowsPerSearch, searchProcesses, searchThreads, searchCache)
+
 for i in range(1,iterations+1): 
     ##select subrange
     print "window position:::"+str(i)
     rangeStart=i-1
     rangeEnd=i+fragmentLength-1
     subrange=str(inseq[rangeStart:rangeEnd].seq)
-
-    fragment=open('fragment.fasta','w')
     print "fragment subrange:::"+subrange
-    fragment.write(subrange)
-    fragment.close()
-    ##submit PSI-BLAST
-    ##run "psiblast -help" for more details of output format (outfmt)
-    exeline="psiblast -num_iterations 1 -word_size 2 -evalue "+str(EvalueThreshold)
-    exeline+=" -outfmt '6 sseqid qstart qend sstart send qseq sseq length gaps bitscore evalue' -matrix BLOSUM62 -db "
-    exeline+=database+" -query fragment.fasta"
-    print "executing:::"+exeline
-    psiblastOut=os.popen(exeline).read()
-    psiblastOut=psiblastOut.splitlines() #now an array
+    psiblastOut=windowHits[i]
     print "Number of searched PDBs:  ", len(psiblastOut)
 #   print psiblastOut
 #   exit()
@@ -214,44 +222,28 @@ for line in match.readlines():
 unique=keys.keys()
 
 from Bio.PDB.PDBParser import PDBParser
+from Bio.PDB.Structure import Structure
 pdbparse=PDBParser(PERMISSIVE=1)
 
 #atomLine=re.compile('\AATOM')
 #Finding homologs
 print inseq.seq
-fragment=open('fragment.fasta','w')
-fragment.write(str(inseq.seq))
-fragment.close()
 homo={} 
 failed_pdb = {}
 for pdbfull in unique:
     pdbID=pdbfull[0:4].lower()
-    pdbIDsecond=pdbfull[1:2].lower()
-    pdbIDthird=pdbfull[2:3].lower()
     chainID=pdbfull[4:5].lower()
     failed_pdb[pdbID] = 0
     homo[pdbID] = 0
-    if not os.path.isfile(pdbDir+pdbID.upper()+".pdb"):
-	##from script 'pdbget' (original author unknown)
-        exeline="wget ftp://ftp.wwpdb.org/pub/pdb/data/structures/divided/pdb/"
-        exeline+=pdbIDsecond+pdbIDthird+"/pdb"+pdbID+".ent.gz"
-        os.system(exeline);
-        os.system("nice gunzip pdb"+pdbID+".ent.gz; mv pdb"+pdbID+".ent "+pdbDir+pdbID.upper()+".pdb");
-
-    if not os.path.isfile(pdbDir+pdbID.upper()+".pdb"):
+    if not pdbStore.available(pdbID):
         print ":::Cannot build PDB for PDB ID, failed to download:"+pdbID.upper()
 	failed_pdb[pdbID] = 1
 	
         
 if brain_damage == 1:
 # blast the whole sequence to identify homologs Evalue 0.005 
-    exeline="psiblast -num_iterations 1 -word_size 2 -evalue 0.005"
-    exeline+=" -outfmt '6 sseqid slen bitscore score evalue' -matrix BLOSUM62 -db "
-    exeline+=database+" -query fragment.fasta"
     print "brain damamge, finding homologs"
-    print "executing::: "+exeline
-    homoOut=os.popen(exeline).read()
-    homoOut=homoOut.splitlines() #now an array
+    homoOut=searchSequence(database, inseq.seq, 0.005, "sseqid slen bitscore score evalue", "BLOSUM62", searchThreads)
     for line in homoOut:
     	entries=line.split()
 	print entries
@@ -281,7 +273,7 @@ for line in matchlines:
         chainID=pdbfull[4:5].lower()
 	groFile=fLibDir+pdbID+chainID+".gro"
 	groName=pdbID+chainID+".gro"
-	pdbFile=pdbDir+pdbID.upper()+".pdb"
+	pdbFile=pdbStore.path(pdbID)
 
 	if failed_pdb[pdbID]:#failed-downloaded ones are still in matchlines, need to be ignored
 		continue
@@ -299,10 +291,10 @@ for line in matchlines:
 	##have to check residue list, not residue index.
 	if count[windows_index_str] >= N_mem:
 		continue
-	if NoMissingAtoms(atoms_list, residue_list, res_Start, pdbID, chainID.upper(), pdbFile):
-	        if os.path.isfile(pdbFile): 
+	if NoMissingAtoms(atoms_list, residue_list, res_Start, pdbID, chainID.upper(), templates.structure(pdbID)):
+	        if pdbStore.available(pdbID): 
 		    if not os.path.isfile(groFile) :
-        	        Pdb2Gro(pdbFile, groFile, chainID.upper())
+        	        Pdb2Gro(templates.structure(pdbID), groFile, chainID.upper())
         	    print ":::convert: "+pdbFile+" --> "+groFile
 		    count[windows_index_str] += 1
             
@@ -336,4 +328,5 @@ for i in count:
 print "Number of blasted PDB: ", len(failed_pdb)
 print "Number of failed downloaded PDB: ", sum(failed_pdb.values())
 print "Number of PDB with Missing atoms: ", len(Missing_pdb)
-print "Discarded fragments with Missing atoms: ", Missing_count 
+print "Discarded fragments with Missing atoms: ", Missing_count
+print "Number of parsed template PDBs: ", templates.parsed 
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+
+# ----------------------------------------------------------------------
+# Summary statistics of every column of observable files (Q, energies,
+# ...) in a single streaming pass: number of values, mean, standard
+# deviation, minimum and maximum with their line, percentiles and a
+# histogram. Lines are counted from 0, without blank and comment lines.
+# Several files are processed in parallel with -np.
+# ----------------------------------------------------------------------
+
+import sys
+from multiprocessing import Pool
+from ColumnStatsLib import ColumnStatistics, readColumnChunks
+
+columns = None
+percentiles = [5.0, 25.0, 50.0, 75.0, 95.0]
+n_hist = 0
+n_proc = 1
+b_total = False
+del_list=[]
+for iarg in range(1, len(sys.argv)):
+	if sys.argv[iarg]=="-columns":
+		columns = [int(c) for c in sys.argv[iarg+1].split(',')]
+		del_list.insert(0, iarg)
+		del_list.insert(0, iarg+1)
+	if sys.argv[iarg]=="-percentiles":
+		percentiles = [float(p) for p in sys.argv[iarg+1].split(',')]
+		del_list.insert(0, iarg)
+		del_list.insert(0, iarg+1)
+	if sys.argv[iarg]=="-hist":
+		n_hist = int(sys.argv[iarg+1])
+		del_list.insert(0, iarg)
+		del_list.insert(0, iarg+1)
+	if sys.argv[iarg]=="-np":
+		n_proc = int(sys.argv[iarg+1])
+		del_list.insert(0, iarg)
+		del_list.insert(0, iarg+1)
+	if sys.argv[iarg]=="-total":
+		b_total = True
+		del_list.insert(0, iarg)
+for idel in del_list:
+	sys.argv.pop(idel)
+
+if len(sys.argv)<2 or n_proc<1:
+	print "\n" + sys.argv[0] + " file1 [file2 ...] [-columns c1,c2,...] [-percentiles p1,p2,...] [-hist n] [-np n] [-total]\n"
+	print "-columns selects the columns to analyze (counted from 0), all columns by default"
+	print "-percentiles sets the percentiles to report, 5,25,50,75,95 by default"
+	print "-hist prints a histogram of every column with at most n bins"
+	print "-np processes the files with n worker processes"
+	print "-total also prints the statistics of all files together, lines are counted through the files in order\n"
+	sys.exit()
+
+files = sys.argv[1:]
+
+def fileStatistics(filename):
+	# Runs in the pool workers as well, so it only returns the result
+	stats = None
+	for data in readColumnChunks(filename):
+		if columns is not None: data = data[:,columns]
+		if stats is None: stats = ColumnStatistics(data.shape[1])
+		stats.update(data)
+	return stats
+
+def print_stats(name, stats):
+	print "# " + name
+	if stats is None or stats.count==0:
+		print "# no data"
+		return
+	labels = columns if columns is not None else range(stats.ncolumns)
+	print "# column count mean std min line_min max line_max " + " ".join(["p%g" % p for p in percentiles])
+	mean = stats.mean()
+	std = stats.std()
+	values = stats.percentiles(percentiles)
+	for c in range(stats.ncolumns):
+		print labels[c], stats.count, mean[c], std[c], stats.min[c], stats.imin[c], stats.max[c], stats.imax[c], " ".join([str(v) for v in values[:,c]])
+	if n_hist>0:
+		for c in range(stats.ncolumns):
+			print "# histogram of column " + str(labels[c]) + ": lower upper count"
+			lower, upper, counts = stats.histogramBins(c, n_hist)
+			for i in range(len(counts)):
+				print lower[i], upper[i], counts[i]
+
+if n_proc>1 and len(files)>1:
+	pool = Pool(min(n_proc, len(files)))
+	results = pool.map(fileStatistics, files)
+	pool.close()
+	pool.join()
+else:
+	results = map(fileStatistics, files)
+
+for i in range(len(files)):
+	print_stats(files[i], results[i])
+
+if b_total:
+	total = None
+	for stats in results:
+		if stats is None: continue
+		if total is None: total = ColumnStatistics(stats.ncolumns, stats.nbins)
+		total.merge(stats)
+	print_stats("all files", total)
@@ -1,18 +1,64 @@
 #!python
 
-from math import atan2
 import sys
+import numpy
+
+# number of test points handled at once when accumulating the field
+chunksize=1<<22
+
+def readTransitions(filename, columns):
+    # Returns the starting and ending states (transitions x 3 integer arrays) of all
+    # consecutive pairs of states within the same simulation. Each simulation is
+    # separated by a blank line so that nothing is added to the vector field for going
+    # from the end of one simulation to the start of another
+    points=[]
+    simulations=[]
+    simulation=0
+    for line in open(filename):
+        line=line.split()
+        if len(line) == 0:
+            simulation=simulation+1
+            continue
+        points.append([int(line[columns[0]]),int(line[columns[1]]),int(line[columns[2]])])
+        simulations.append(simulation)
+    points=numpy.array(points, dtype=numpy.int64).reshape(-1,3)
+    simulations=numpy.array(simulations)
+    sametrajectory=simulations[:-1] == simulations[1:]
+    return points[:-1][sametrajectory], points[1:][sametrajectory]
+
+def accumulateComponent(flowfield, point1, point2, coord):
+    # The transition line crosses the planes i = tpi (const) of all test points between
+    # its end points. At the crossing the test point tpj, tpk closest to the line gets
+    # sign(p2i-p1i) added if the line passes within 0.5 of it in both j and k
+    i=coord       # i.e. x then y then z
+    j=(coord+1)%3 #      y then z then x
+    k=(coord+2)%3 #      z then x then y
+    moving=point1[:,i] != point2[:,i] # transitions that do not move in i do not contribute to that component
+    p1=point1[moving].astype(numpy.float64)
+    p2=point2[moving].astype(numpy.float64)
+    # one entry per transition and crossed plane
+    counts=numpy.abs(point2[moving,i]-point1[moving,i])+1
+    transition=numpy.repeat(numpy.arange(len(counts)), counts)
+    tpi=numpy.minimum(p1[:,i],p2[:,i])[transition]+(numpy.arange(counts.sum())-numpy.repeat(numpy.cumsum(counts)-counts, counts))
+    p1=p1[transition]
+    p2=p2[transition]
+    # find the point where the transition line crosses the i=tpi (const) plane
+    test1=((p2[:,j]-p1[:,j])/(p2[:,i]-p1[:,i]))*(tpi-p1[:,i])+p1[:,j]
+    test2=((p2[:,k]-p1[:,k])/(p2[:,i]-p1[:,i]))*(tpi-p1[:,i])+p1[:,k]
+    tpj=numpy.floor(test1+0.5)
+    tpk=numpy.floor(test2+0.5)
+    nearby=(test1 > tpj-0.5) & (test1 < tpj+0.5) & (test2 > tpk-0.5) & (test2 < tpk+0.5)
+    tp=numpy.zeros((nearby.sum(),3), dtype=numpy.int64)
+    tp[:,i]=tpi[nearby]
+    tp[:,j]=tpj[nearby]
+    tp[:,k]=tpk[nearby]
+    dimension=flowfield.shape[0]
+    if len(tp) > 0 and (tp.min() < 0 or tp.max() >= dimension):
+        print "Number of contacts outside of the field, the dimension should be greater than " + str(tp.max())
+        sys.exit()
+    flat=(tp[:,0]*dimension+tp[:,1])*dimension+tp[:,2]
+    flowfield[:,:,:,coord]+=numpy.bincount(flat, weights=numpy.sign(p2[nearby,i]-p1[nearby,i]), minlength=dimension**3).reshape(dimension,dimension,dimension)
 
-# define a function which returns the sign of an argument
-# this is used when adding vector components to the field
-def sign(x):
-    if(x > 0):
-        return 1
-    elif(x < 0):
-        return -1
-    else:
-        return 0
-        
 # this is the file that contains all the transition information
 # it can, and should, contain data from multiple simulations
 # each simulation is separated by a blank line so that nothing
@@ -31,65 +77,17 @@ x=[int(sys.argv[3]),int(sys.argv[4]),int(sys.argv[5])]
 scalefactor=sys.argv[6]
 
 # Initialize vector field, it is a 3D array of 3D vectors
-flowfield=[]
-for i in xrange(dimension):
-    flowfield.append([])
-    for j in xrange(dimension):
-        flowfield[i].append([])
-        for k in xrange(dimension):
-            flowfield[i][j].append([0,0,0]) # all components are zero initially
+flowfield=numpy.zeros((dimension,dimension,dimension,3)) # all components are zero initially
 
-# The loop below needs to know if the state it reads in is the first one for
-# a given simulation; if it is, it will break out of the loop after reading it in
-firstone = 1
+# Read all transitions between consecutive states
+point1, point2 = readTransitions(filename, x)
 
-# For all of the rest of the points
-for line in file(filename):
-    # If this is the first line, get it and go on to the next line
-    line = line.strip()
-    if line == "": # blank lines are used to indicate the start of a new simulation
-        firstone = 1 # so the next line it reads in should be a "first one"
-        continue
-    if(firstone): # as mentioned above, if this is the first state in a simulation,
-        point1 = line.split() # read it in and then go immediately to the next state
-        firstone=0            # without adding anything to the vector field
-        continue
-
-    # Get the next line
-    point2 = line.split()
-    # Loop over all possible points where you might want to add to the vector field
-    for xt in range(min(int(point1[x[0]]),int(point2[x[0]])),max(int(point1[x[0]]),int(point2[x[0]]))+1):
-        for yt in range(min(int(point1[x[1]]),int(point2[x[1]])),max(int(point1[x[1]]),int(point2[x[1]]))+1):
-            for zt in range(min(int(point1[x[2]]),int(point2[x[2]])),max(int(point1[x[2]]),int(point2[x[2]]))+1):
-                # For each test point
-                tp=[xt,yt,zt]
-                # Loop over all components of the vector x, y and z
-                for coord in [0,1,2]:
-                    # Make sure you are not going to divide by zero, if so skip because those transitions won't contribute to that component anyway
-                    if(int(point1[x[coord]]) != int(point2[x[coord]])):
-                        # Find where the transition line crosses the plane defined by the test point and the component
-                        # in the first case
-                        i = x[coord]       # i.e. x then y then z
-                        j = x[(coord+1)%3] #      y then z then x
-                        k = x[(coord+2)%3] #      z then x then y
-                        p1i = float(point1[i]) # starting point i
-                        p1j = float(point1[j]) #                j
-                        p1k = float(point1[k]) #                k
-                        p2i = float(point2[i]) # ending point   i
-                        p2j = float(point2[j]) #                j
-                        p2k = float(point2[k]) #                k
-                        tpi = float(tp[coord]) # test point     i
-                        tpj = float(tp[(coord+1)%3]) #          j
-                        tpk = float(tp[(coord+2)%3]) #          k
-                        # find the point where the transition line crosses the i=tpi (const) plane
-                        test1 = ((p2j-p1j)/(p2i-p1i))*(tpi-p1i)+p1j 
-                        if(test1 > tpj-0.5 and test1 < tpj+0.5): # if it passes close by the test point, go to the next test
-                           test2 = ((p2k-p1k)/(p2i-p1i))*(tpi-p1i)+p1k # find the other coordinate for the same point
-                           if(test2 > tpk-0.5 and test2 < tpk+0.5):
-                                # If it passes nearby the test point, add the appropriate component to the vector field
-                                flowfield[xt][yt][zt][coord]=flowfield[xt][yt][zt][coord]+sign(int(p2i-p1i))
-                                        
-    point1 = point2 # make the ending point the new starting point then loop back to get a new ending point
+# Add the transitions to the vector field, a chunk of transitions at a time so that the
+# arrays of crossed test points stay bounded
+step=max(1, chunksize/(dimension+1))
+for start in range(0, len(point1), step):
+    for coord in [0,1,2]:
+        accumulateComponent(flowfield, point1[start:start+step], point2[start:start+step], coord)
 
 # print the results in a Mathematica friendly way
 # print "{",
@@ -102,13 +100,10 @@ for line in file(filename):
 # print "}"
 
 # print the results in a gnuplot friendly way
+# scale the field
+flowfield=(flowfield*float(scalefactor)).tolist()
 for i in xrange(dimension):
     for j in xrange(dimension):
         for k in xrange(dimension):
-            # scale the field
-            flowfield[i][j][k][0]=flowfield[i][j][k][0]*float(scalefactor)
-            flowfield[i][j][k][1]=flowfield[i][j][k][1]*float(scalefactor)
-            flowfield[i][j][k][2]=flowfield[i][j][k][2]*float(scalefactor)
             # print out a line with coordinates and field
             print i,j,k,flowfield[i][j][k][0],flowfield[i][j][k][1],flowfield[i][j][k][2]
-
@@ -0,0 +1,161 @@
+#!/usr/bin/python
+
+# ----------------------------------------------------------------------
+# Streaming readers and summary statistics for observable files (Q,
+# energies, ...). The files are read in chunks of lines converted with
+# numpy, so multi-GB files are processed in one pass with bounded memory.
+# Used by CalcColumnStats.py, findMax.py and findMin.py.
+#
+# Percentiles come from a histogram of nbins bins per column. Its bin
+# width doubles whenever a value falls outside of the covered range, so
+# the counts stay exact and percentiles are accurate to one bin width,
+# about (max-min)/(nbins/2).
+# ----------------------------------------------------------------------
+
+import numpy
+
+def readLineChunks(filename, chunklines=1<<16):
+	# lists of at most chunklines data lines, blank and comment (#) lines are skipped
+	lines = []
+	for line in open(filename, 'r'):
+		line = line.strip()
+		if line == "" or line[0] == "#": continue
+		lines.append(line)
+		if len(lines) >= chunklines:
+			yield lines
+			lines = []
+	if len(lines) > 0:
+		yield lines
+
+def readTokenChunks(filename, skip=0, chunklines=1<<16):
+	# all numbers of the file as a flat sequence, in float arrays, without the first skip numbers
+	for lines in readLineChunks(filename, chunklines):
+		values = numpy.array(' '.join(lines).split(), dtype=numpy.float64)
+		if skip >= len(values):
+			skip -= len(values)
+			continue
+		yield values[skip:]
+		skip = 0
+
+def readColumnChunks(filename, chunklines=1<<16):
+	# (lines x columns) float arrays of the data lines
+	ncolumns = -1
+	for lines in readLineChunks(filename, chunklines):
+		values = numpy.array(' '.join(lines).split(), dtype=numpy.float64)
+		if ncolumns < 0: ncolumns = len(lines[0].split())
+		if len(values) != len(lines)*ncolumns:
+			raise ValueError("%s: all lines should have %d columns" % (filename, ncolumns))
+		yield values.reshape(len(lines), ncolumns)
+
+class ColumnStatistics:
+	count = 0
+	ncolumns = 0
+
+	def __init__(self, ncolumns, nbins=4096):
+		self.ncolumns = ncolumns
+		self.nbins = nbins
+		self.count = 0
+		self.sum = numpy.zeros(ncolumns)
+		self.sumsq = numpy.zeros(ncolumns)
+		self.min = numpy.zeros(ncolumns)
+		self.imin = numpy.zeros(ncolumns, dtype=numpy.int64)
+		self.max = numpy.zeros(ncolumns)
+		self.imax = numpy.zeros(ncolumns, dtype=numpy.int64)
+		self.histogram = numpy.zeros((ncolumns, nbins), dtype=numpy.int64)
+		self.lower = numpy.zeros(ncolumns)
+		self.width = numpy.zeros(ncolumns)
+
+	def update(self, data):
+		"""Add a (lines x columns) chunk, lines are numbered after the ones added before"""
+		if len(data) == 0: return
+		columns = numpy.arange(self.ncolumns)
+		imin = numpy.argmin(data, axis=0)
+		imax = numpy.argmax(data, axis=0)
+		chunkmin = data[imin, columns]
+		chunkmax = data[imax, columns]
+		if self.count == 0:
+			self.min[:] = chunkmin
+			self.imin[:] = imin
+			self.max[:] = chunkmax
+			self.imax[:] = imax
+			self.lower[:] = chunkmin
+			self.width[:] = numpy.where(chunkmax > chunkmin, (chunkmax-chunkmin)*1.000001/self.nbins, numpy.maximum(numpy.abs(chunkmin), 1.0)/self.nbins)
+		else:
+			# the first line of an extremum is kept
+			smaller = chunkmin < self.min
+			self.min[smaller] = chunkmin[smaller]
+			self.imin[smaller] = self.count + imin[smaller]
+			larger = chunkmax > self.max
+			self.max[larger] = chunkmax[larger]
+			self.imax[larger] = self.count + imax[larger]
+		self.sum += data.sum(0)
+		self.sumsq += (data**2).sum(0)
+		for column in range(self.ncolumns):
+			self.cover(column, chunkmin[column], chunkmax[column])
+			bins = numpy.minimum(((data[:,column]-self.lower[column])/self.width[column]).astype(numpy.int64), self.nbins-1)
+			self.histogram[column] += numpy.bincount(bins, minlength=self.nbins)
+		self.count += len(data)
+
+	def cover(self, column, low, high):
+		# double the bin width of the histogram of column until it covers [low, high]
+		while low < self.lower[column] or high >= self.lower[column] + self.nbins*self.width[column]:
+			merged = self.histogram[column].reshape(-1, 2).sum(1)
+			self.histogram[column] = 0
+			if low < self.lower[column]:
+				# the old range becomes the upper half
+				self.lower[column] -= self.nbins*self.width[column]
+				self.histogram[column, self.nbins/2:] = merged
+			else:
+				self.histogram[column, 0:self.nbins/2] = merged
+			self.width[column] *= 2
+
+	def merge(self, other):
+		"""Add the statistics of other, whose lines follow the ones of self"""
+		if other.count == 0: return
+		if other.ncolumns != self.ncolumns:
+			raise ValueError("Cannot merge statistics of %d and %d columns" % (self.ncolumns, other.ncolumns))
+		if self.count == 0:
+			for name, value in other.__dict__.items():
+				setattr(self, name, value.copy() if hasattr(value, 'copy') else value)
+			return
+		for column in range(self.ncolumns):
+			self.cover(column, other.min[column], other.max[column])
+			centers = other.lower[column] + (numpy.arange(other.nbins)+0.5)*other.width[column]
+			occupied = other.histogram[column] > 0
+			bins = numpy.minimum(((centers[occupied]-self.lower[column])/self.width[column]).astype(numpy.int64), self.nbins-1)
+			self.histogram[column] += numpy.bincount(bins, weights=other.histogram[column][occupied], minlength=self.nbins).astype(numpy.int64)
+		smaller = other.min < self.min
+		self.min[smaller] = other.min[smaller]
+		self.imin[smaller] = self.count + other.imin[smaller]
+		larger = other.max > self.max
+		self.max[larger] = other.max[larger]
+		self.imax[larger] = self.count + other.imax[larger]
+		self.sum += other.sum
+		self.sumsq += other.sumsq
+		self.count += other.count
+
+	def mean(self):
+		return self.sum/self.count
+
+	def std(self):
+		return numpy.sqrt(numpy.maximum(self.sumsq/self.count - self.mean()**2, 0.0))
+
+	def percentiles(self, q):
+		"""(len(q) x columns) percentiles, interpolated linearly within the histogram bins"""
+		result = numpy.zeros((len(q), self.ncolumns))
+		for column in range(self.ncolumns):
+			cumulative = numpy.concatenate([[0], numpy.cumsum(self.histogram[column])])
+			edges = self.lower[column] + numpy.arange(self.nbins+1)*self.width[column]
+			result[:,column] = numpy.interp(numpy.asarray(q, dtype=numpy.float64)/100.0*self.count, cumulative, edges)
+		return numpy.clip(result, self.min, self.max)
+
+	def histogramBins(self, column, nbins):
+		"""(lower edges, upper edges, counts) of at most nbins bins between min and max of column,
+		made by merging the internal bins, so the counts are exact"""
+		occupied = numpy.nonzero(self.histogram[column])[0]
+		first = occupied[0]
+		factor = -(-(occupied[-1]+1-first)/nbins)
+		counts = self.histogram[column, first:occupied[-1]+1]
+		counts = numpy.concatenate([counts, numpy.zeros(-len(counts) % factor, dtype=numpy.int64)]).reshape(-1, factor).sum(1)
+		lower = self.lower[column] + (first + factor*numpy.arange(len(counts)))*self.width[column]
+		return lower, lower + factor*self.width[column], counts
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+# ----------------------------------------------------------------------
+# Copyright (2010) Aram Davtyan and Garegin Papoian
+
+# Papoian's Group, University of Maryland at Collage Park
+# http://papoian.chem.umd.edu/
+
+# Minimal CHARMM/NAMD style DCD trajectory writer. Only coordinates are
+# stored (no unit cell), in native byte order, which is what VMD expects
+# together with a PSF file describing the topology. The header counts in
+# timesteps: istart is the timestep of the first frame and nsavc the
+# number of timesteps between frames, which may be set any time before
+# close() if it is only known from the second frame.
+
+# Last Update: 10/19/2026
+# ----------------------------------------------------------------------
+
+import struct
+from array import array
+
+def _tobytes(a):
+	if hasattr(a, 'tobytes'): return a.tobytes()
+	return a.tostring()
+
+def _record(data):
+	size = struct.pack('=i', len(data))
+	return size + data + size
+
+class DCDWriter:
+	natoms = 0
+	nframes = 0
+
+	def __init__(self, filename, natoms, title='', istart=0, nsavc=1, delta=1.0):
+		self.natoms = natoms
+		self.nframes = 0
+		self.istart = istart
+		self.nsavc = nsavc
+		self.f = open(filename, 'wb')
+
+		icntrl = [0]*20
+		icntrl[1] = istart
+		icntrl[2] = nsavc
+		icntrl[19] = 24
+		header = b'CORD' + struct.pack('=9i', *icntrl[:9]) + struct.pack('=f', delta) + struct.pack('=10i', *icntrl[10:])
+		self.f.write(_record(header))
+
+		title = ('REMARKS ' + title + ' '*80)[:80]
+		self.f.write(_record(struct.pack('=i', 1) + title.encode('ascii')))
+		self.f.write(_record(struct.pack('=i', natoms)))
+
+	def write_frame(self, coords):
+		"""coords is a list of objects with x, y, z attributes, a list of
+		[x, y, z] triples or an (natoms x 3) numpy array"""
+		if len(coords)!=self.natoms:
+			raise ValueError("Frame has %d atoms, DCD file has %d" % (len(coords), self.natoms))
+		if hasattr(coords, 'dtype'):
+			xyz = coords.astype('=f4')
+			blocks = [xyz[:,k].tobytes() for k in range(3)]
+		elif self.natoms>0 and hasattr(coords[0], 'x'):
+			blocks = [_tobytes(array('f', [ia.x for ia in coords])),
+				  _tobytes(array('f', [ia.y for ia in coords])),
+				  _tobytes(array('f', [ia.z for ia in coords]))]
+		else:
+			blocks = [_tobytes(array('f', [v[k] for v in coords])) for k in range(3)]
+		for b in blocks:
+			self.f.write(_record(b))
+		self.nframes += 1
+
+	def close(self):
+		# Number of frames, frame interval and last step are only known at the end
+		self.f.seek(8)
+		self.f.write(struct.pack('=i', self.nframes))
+		self.f.seek(16)
+		self.f.write(struct.pack('=i', self.nsavc))
+		self.f.seek(20)
+		self.f.write(struct.pack('=i', self.istart + self.nsavc*self.nframes))
+		self.f.close()
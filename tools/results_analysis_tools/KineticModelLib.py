@@ -0,0 +1,935 @@
+##########################################################################
+# Kinetic model of foldon microstates from umbrella sampling simulations #
+#                                                                        #
+# Shared by formulateKineticModel.py and formulateKineticModel_master.py #
+# which only set the parameters of a KineticModel and call run().        #
+# The pipeline stages (trajectory reading, microstate assignment,        #
+# subsampling, MBAR and the per temperature PMFs) save their results as  #
+# arrays together with a key of their inputs. A stage is only recomputed #
+# when its key changes, so e.g. a new k0 only repeats the rate stage and #
+# a new foldon threshold only the microstate and PMF stages.             #
+##########################################################################
+
+#############
+# Libraries #
+#############
+import math
+import os
+import sys
+import numpy
+numpy.set_printoptions(threshold=sys.maxsize)
+from numpy import linalg as LA
+import cPickle
+import time as timefunctions
+import hashlib
+import cStringIO
+from multiprocessing import Pool
+import scipy.sparse
+import scipy.sparse.linalg
+
+# pymbar imports
+import pymbar
+
+#############
+# Constants #
+#############
+# Boltzmann constant
+kb = 0.001987 # kcal/mol/K
+
+#########################
+# Classes and Functions #
+#########################
+def stageKey(*values):
+    key = hashlib.sha1()
+    for value in values:
+        key.update(repr(value))
+    return key.hexdigest()
+
+def fileDigest(filename):
+    digest = hashlib.sha1()
+    f = open(filename, 'rb')
+    for block in iter(lambda: f.read(1<<20), ''):
+        digest.update(block)
+    f.close()
+    return digest.hexdigest()
+
+def fileStamp(filename):
+    # Dump files are too large to hash, their size and modification time are used
+    info = os.stat(filename)
+    return [filename, info.st_size, int(info.st_mtime)]
+
+def loadStage(filename, key):
+    if os.path.exists(filename):
+        data = numpy.load(filename)
+        if str(data['key']) == key:
+            return data
+    return None
+
+def saveStage(filename, key, **arrays):
+    tmpfile = filename[:-4] + "." + str(os.getpid()) + ".npz"
+    numpy.savez(tmpfile, key=numpy.array(key), **arrays)
+    os.rename(tmpfile, filename)
+
+def readDumpFile(dumpFile, atomType='CA', frequency=1):
+    # Returns the CA (or CB) coordinates of every frequency-th snapshot
+    # as a float32 array (snapshots x residues x 3)
+    if atomType == 'CA':
+        selectedTypes = [1]
+    elif atomType == 'CB':
+        selectedTypes = [4, 5]
+    else:
+        print "Wrong atom type: " + str(atomType)
+        sys.exit()
+
+    frames = []
+    bounds = []
+    lines = []
+    item = ""
+    snapshotIndex = -1
+    f = open(dumpFile,"r")
+    for line in f:
+        if line[:5] == "ITEM:":
+            item = line[6:].strip()
+            if item == "TIMESTEP":
+                if len(lines) > 0:
+                    frames.append(frameCoordinates(bounds, lines, selectedTypes))
+                lines = []
+                bounds = []
+                snapshotIndex += 1
+            continue
+        if snapshotIndex % frequency != 0:
+            continue
+        if item[:10] == "BOX BOUNDS":
+            line = line.split()
+            bounds.append([float(line[0]), float(line[1])])
+        elif item[:5] == "ATOMS":
+            lines.append(line)
+    f.close()
+    if len(lines) > 0:
+        frames.append(frameCoordinates(bounds, lines, selectedTypes))
+
+    for frame in frames:
+        if len(frame) != len(frames[0]):
+            print "Wrong number of residues in " + dumpFile + ": " + str(len(frame)) + " instead of " + str(len(frames[0]))
+            sys.exit()
+
+    return numpy.array(frames, dtype=numpy.float32).reshape(len(frames), -1, 3)
+
+def frameCoordinates(bounds, lines, selectedTypes):
+    data = numpy.array(' '.join(lines).split(), dtype=numpy.float64).reshape(len(lines), -1)
+    data = data[numpy.in1d(data[:,1].astype(int), selectedTypes)]
+    bounds = numpy.array(bounds)
+    return ((bounds[:,1]-bounds[:,0])*data[:,2:5]+bounds[:,0]).astype(numpy.float32)
+
+def readSnapshotDataFile(snapshotDataFile, numSnapshots, frequency=1):
+    # Q, internal energy, biasing energy and temperature of the snapshots
+    # kept from the dump file, snapshots without data are left at zero
+    data = numpy.zeros((numSnapshots, 4), numpy.float64)
+    snapshotindex = 0
+    lineindex = 0
+    ssdata = open(snapshotDataFile, 'r')
+    for dataline in ssdata:
+        dataline = dataline.split()
+        if len(dataline) == 0 or dataline[0] == "#":
+            continue
+        if snapshotindex >= numSnapshots:
+            break
+        if lineindex % frequency == 0:
+            data[snapshotindex] = [float(value) for value in dataline[1:5]]
+            snapshotindex += 1
+        lineindex += 1
+    ssdata.close()
+
+    return data
+
+def readFoldonFile(foldonFile):
+    # Each line contains the (1-based) residues of one foldon
+    foldons = []
+    f = open(foldonFile,"r")
+    for line in f:
+        line = line.split()
+        if len(line) == 0 or line[0] == "#":
+            continue
+        foldons.append([int(residue)-1 for residue in line])
+    f.close()
+
+    return foldons
+
+def pairwiseDistances(coords):
+    coords = numpy.asarray(coords, dtype=numpy.float64)
+    return numpy.sqrt(((coords[:,numpy.newaxis,:]-coords[numpy.newaxis,:,:])**2).sum(-1))
+
+def findNativeContacts(nativedistances, nativeContactThreshold, minSeqSep):
+    residues1, residues2 = numpy.nonzero(numpy.triu(nativedistances < nativeContactThreshold))
+    separated = numpy.abs(residues1-residues2) >= minSeqSep
+    return [[int(i), int(j)] for i, j in zip(residues1[separated], residues2[separated])]
+
+def sortNativeContactsByFoldon(foldons, nativecontactlist, includeInterfaceContacts):
+    foldoncontacts = []
+    for foldon in foldons:
+        residues = set(foldon)
+        contacts = []
+        for residue1, residue2 in nativecontactlist:
+            if includeInterfaceContacts:
+                monitored = residue1 in residues or residue2 in residues
+            else:
+                monitored = residue1 in residues and residue2 in residues
+            if monitored:
+                contacts.append([residue1, residue2])
+        foldoncontacts.append(contacts)
+
+        print "Foldon definition:"
+        print foldon
+        print "Number of native contacts:"
+        print len(contacts)
+        print "Native contacts being monitored:"
+        print contacts
+
+    return foldoncontacts
+
+def assignUstates(coords, foldoncontacts, nativedistances, qType, contactFactor, minSeqSep, foldonThreshold, chunksize=1<<22):
+    # Decimal microstate codes of all snapshots, bit i is set if foldon i is folded.
+    # The native pairs of all foldons are index arrays with a (pairs x foldons) mask
+    # for the per foldon sums. Snapshots are processed in chunks of about
+    # chunksize pair distances
+    pairs = []
+    for f in range(len(foldoncontacts)):
+        if len(foldoncontacts[f]) == 0:
+            print "Foldon " + str(f+1) + " has no native contacts"
+            sys.exit()
+        for residue1, residue2 in foldoncontacts[f]:
+            pairs.append([residue1, residue2, f])
+    pairs = numpy.array(pairs, dtype=numpy.int64)
+    residues1 = pairs[:,0]
+    residues2 = pairs[:,1]
+    distances = numpy.asarray(nativedistances, dtype=numpy.float64)[residues1,residues2]
+    widths = 2*numpy.power(numpy.abs(residues1-residues2), 0.3)
+    mask = numpy.zeros((len(pairs), len(foldoncontacts)), numpy.float64)
+    mask[numpy.arange(len(pairs)),pairs[:,2]] = 1.0
+    numcontacts = mask.sum(0)
+
+    bits = numpy.power(2, numpy.arange(len(foldoncontacts)))
+    ustates = numpy.zeros(len(coords), numpy.int32)
+    step = max(1, chunksize/len(residues1))
+    for start in range(0, len(coords), step):
+        chunk = numpy.asarray(coords[start:start+step], dtype=numpy.float64)
+        r = numpy.sqrt(((chunk[:,residues1,:]-chunk[:,residues2,:])**2).sum(-1))
+        if qType == 'QC':
+            contacts = (numpy.abs(residues1-residues2) >= minSeqSep) & (r < contactFactor*distances)
+            values = contacts.astype(numpy.float64)
+        elif qType == 'QW':
+            values = numpy.exp(-(r-distances)**2/widths)
+        folded = values.dot(mask)/numcontacts > foldonThreshold
+        ustates[start:start+step] = folded.dot(bits)
+    return ustates
+
+def autocorrelationFunction(A_n):
+    # Normalized autocorrelation C(t), t = 0..N-1, of a time series from one FFT
+    # of the zero padded fluctuations
+    dA_n = numpy.asarray(A_n, dtype=numpy.float64) - numpy.mean(A_n)
+    N = len(dA_n)
+    size = 1
+    while size < 2*N:
+        size *= 2
+    transform = numpy.fft.rfft(dA_n, size)
+    acf = numpy.fft.irfft(transform*numpy.conjugate(transform), size)[0:N]
+    return acf/numpy.arange(N, 0, -1)/(acf[0]/N)
+
+def statisticalInefficiency(A_n, mintime=3):
+    # g = 1 + 2 sum_t (1-t/N) C(t), summed up to the first t > mintime where C(t)
+    # drops to zero or below, as in pymbar's timeseries.statisticalInefficiency
+    N = len(A_n)
+    if N < 2 or numpy.var(A_n) == 0.0:
+        return 1.0
+    C_t = autocorrelationFunction(A_n)
+    t = numpy.arange(N)
+    ends = numpy.nonzero((C_t <= 0.0) & (t > mintime))[0]
+    cutoff = ends[0] if len(ends) > 0 else N
+    g = 1.0 + 2.0*numpy.sum(C_t[1:cutoff]*(1.0-t[1:cutoff]/float(N)))
+    return max(1.0, g)
+
+def uncorrelatedIndices(N, g):
+    # Indices round(n*g) < N of snapshots that are g apart, half rounded up like
+    # pymbar's timeseries.subsampleCorrelatedData
+    indices = numpy.floor(numpy.arange(int(math.ceil(N/g))+1)*g + 0.5).astype(numpy.int64)
+    return numpy.unique(indices[indices < N])
+
+def decimalfoldonstate(binaryfoldonstate):
+    decimalfoldonstate = 0
+    for i in range(len(binaryfoldonstate)):
+        decimalfoldonstate += pow(2,i)*int(binaryfoldonstate[i])
+    return decimalfoldonstate
+
+def binaryfoldonstate(decimalfoldonstate, numfoldons):
+    return bin(decimalfoldonstate)[2:].zfill(numfoldons)[::-1]
+
+def popcount(codes, numfoldons):
+    # Number of set bits (folded foldons) of integer microstate codes
+    codes = numpy.asarray(codes, dtype=numpy.int64)
+    count = numpy.zeros(codes.shape, numpy.int64)
+    for i in range(numfoldons):
+        count += (codes >> i) & 1
+    return count
+
+def connectedMicrostates(codes, numfoldons):
+    # Index pairs (i, j) of sampled microstates differing in exactly one foldon,
+    # found by flipping every foldon bit and looking the result up in the
+    # sorted codes
+    codes = numpy.asarray(codes, dtype=numpy.int64)
+    flipped = numpy.bitwise_xor(codes[:,numpy.newaxis], numpy.left_shift(1, numpy.arange(numfoldons)))
+    index = numpy.minimum(numpy.searchsorted(codes, flipped), len(codes)-1)
+    connected = codes[index] == flipped
+    rows = numpy.repeat(numpy.arange(len(codes)), numfoldons).reshape(flipped.shape)
+    return rows[connected], index[connected]
+
+def findUstateStabilityGap(ranks, freeenergies, minrank, maxrank):
+    freeenergies = numpy.asarray(freeenergies)
+    minrankminfreeenergy = freeenergies[ranks == minrank].min()
+    maxrankminfreeenergy = freeenergies[ranks == maxrank].min()
+
+    return maxrankminfreeenergy - minrankminfreeenergy
+
+def floatRange(a, b, inc):
+    try: x = [float(a)]
+    except: return False
+    for i in range(1, int(math.ceil((b - a ) / inc))):
+        x. append(a + i * inc)
+
+    return x
+
+def saveMatrix(filename, matrix):
+    # Sparse matrices are written as "row column value" lines
+    if scipy.sparse.issparse(matrix):
+        matrix = matrix.tocoo()
+        numpy.savetxt(filename, numpy.transpose([matrix.row, matrix.col, matrix.data]), fmt='%d %d %.18e')
+    else:
+        numpy.savetxt(filename, matrix)
+
+class RateModel:
+    # Rate matrix, relaxation modes and time evolution of the sampled
+    # microstates at one temperature. ratematrix[j,i] is the rate from i to j
+    sparse = False
+    numEigenmodes = 10
+
+    def __init__(self, codes, freeenergies, numfoldons, k0, sparse=False, numEigenmodes=10):
+        self.codes = numpy.asarray(codes)
+        self.freeenergies = numpy.asarray(freeenergies, dtype=numpy.float64)
+        self.numfoldons = numfoldons
+        self.sparse = sparse
+        # The overall rates use the two slowest relaxation modes after the equilibrium one
+        self.numEigenmodes = max(3, numEigenmodes)
+        self.ratematrix = self.calculateRateMatrix(k0)
+
+    def calculateRateMatrix(self, k0):
+        # Microstates differing in one foldon are connected, downhill rate k0,
+        # uphill rate k0*exp(-free energy difference)
+        rows, cols = connectedMicrostates(self.codes, self.numfoldons)
+        rates = k0*numpy.exp(-numpy.maximum(self.freeenergies[cols]-self.freeenergies[rows], 0.0))
+        numstates = len(self.codes)
+        if self.sparse:
+            ratematrix = scipy.sparse.coo_matrix((rates, (rows, cols)), shape=(numstates, numstates)).tocsr()
+            ratematrix = ratematrix - scipy.sparse.diags(numpy.asarray(ratematrix.sum(1)).ravel(), 0)
+            return ratematrix.transpose().tocsr()
+
+        ratematrix = numpy.zeros((numstates,numstates),dtype=numpy.float64)
+        ratematrix[rows,cols] = rates
+        ratematrix[numpy.diag_indices_from(ratematrix)] = -ratematrix.sum(1)
+
+        return numpy.transpose(ratematrix)
+
+    def equilibriumPopulations(self):
+        populations = numpy.exp(-(self.freeenergies-self.freeenergies.min()))
+        return populations/populations.sum()
+
+    def symmetrizeRateMatrix(self, scale):
+        return (scipy.sparse.diags(1.0/scale, 0).dot(self.ratematrix).dot(scipy.sparse.diags(scale, 0))).tocsr()
+
+    def calculateEigenvectorsEigenvalues(self, eigenvaluesout):
+        if self.sparse and self.numEigenmodes < self.ratematrix.shape[0]-1:
+            # Only the slowest modes, i.e. the largest eigenvalues. The rates obey detailed
+            # balance, so P^-1/2 K P^1/2 is symmetric and has the same eigenvalues
+            scale = numpy.sqrt(self.equilibriumPopulations())
+            eigenvalues, eigenvectors = scipy.sparse.linalg.eigsh(self.symmetrizeRateMatrix(scale), k=self.numEigenmodes, which='LA')
+            eigenvectors = eigenvectors*scale[:,numpy.newaxis]
+            perm = numpy.argsort(-eigenvalues)
+        elif self.sparse:
+            eigenvalues, eigenvectors=LA.eig(self.ratematrix.toarray())
+            perm = numpy.argsort(-numpy.real(eigenvalues))
+        else:
+            eigenvalues, eigenvectors=LA.eig(self.ratematrix)
+            perm = numpy.argsort(-eigenvalues)  # sort in descending order
+        for i in range(len(eigenvalues)):
+            if abs(numpy.real(eigenvalues[i])) > 0.0:
+                eigenvaluesout.write("%s\n" % str(numpy.imag(eigenvalues[i])/numpy.real(eigenvalues[i])))
+            else:
+                eigenvaluesout.write("0.0\n")
+        self.eigenvalues = numpy.real(eigenvalues)
+        self.eigenvectors = numpy.real(eigenvectors)
+        self.sortedeigenvalues = numpy.real(eigenvalues[perm])
+        self.sortedeigenvectors = numpy.real(numpy.transpose(eigenvectors[:, perm]))
+
+    def calculateCoefficients(self, initialconcentrations):
+        # Expansion of the initial concentrations in the eigenvectors of the rate matrix
+        if self.eigenvectors.shape[0] == self.eigenvectors.shape[1]:
+            return numpy.dot(LA.inv(self.eigenvectors),initialconcentrations)
+        # Only the slowest modes are known. The rates obey detailed balance, so the
+        # left eigenvectors are the right ones divided by the equilibrium populations
+        lefteigenvectors = self.eigenvectors/self.equilibriumPopulations()[:,numpy.newaxis]
+        norms = (lefteigenvectors*self.eigenvectors).sum(0)
+        return numpy.dot(numpy.transpose(lefteigenvectors),initialconcentrations)/norms[:,numpy.newaxis]
+
+    def calculateConcentrations(self, coefficients, times):
+        # Concentrations of all states at all times, (states x times):
+        # eigenvectors x exp(eigenvalue*time) x coefficients
+        times = numpy.asarray(times, dtype=numpy.float64)
+        modes = coefficients[:,0:1]*numpy.exp(self.eigenvalues[:,numpy.newaxis]*times[numpy.newaxis,:])
+        return numpy.dot(self.eigenvectors, modes)
+
+    def calculateFluxEvolution(self, concentrations):
+        # Net flux K[j,i]*c_i(t)-K[i,j]*c_j(t) from state i to state j at all times,
+        # for every connected pair (i, j) with i < j, (times x pairs)
+        rows, cols = connectedMicrostates(self.codes, self.numfoldons)
+        pairs = rows < cols
+        rows = rows[pairs]
+        cols = cols[pairs]
+        forward = numpy.asarray(self.ratematrix[cols,rows]).ravel()
+        backward = numpy.asarray(self.ratematrix[rows,cols]).ravel()
+        fluxes = forward[:,numpy.newaxis]*concentrations[rows,:] - backward[:,numpy.newaxis]*concentrations[cols,:]
+        return rows, cols, numpy.transpose(fluxes)
+
+    def integratedConcentrations(self, initialconcentrations, coefficients, endTime, equilibriumFlux):
+        # Integral of c(t)-c(infinity) from 0 to endTime (to infinity for the equilibrium
+        # flux) when only the slowest modes are known. It solves K a = c(endTime)-c(0)
+        # with sum(a) = 0. In the symmetrized form the computed modes are inverted
+        # directly and the fast remainder is solved with conjugate gradients
+        scale = numpy.sqrt(self.equilibriumPopulations())
+        if equilibriumFlux:
+            finalconcentrations = scale*scale*initialconcentrations.sum()
+        else:
+            finalconcentrations = numpy.dot(self.eigenvectors, coefficients[:,0]*numpy.exp(self.eigenvalues*float(endTime)))
+        rhs = (finalconcentrations-initialconcentrations)/scale
+        symmetricvectors = self.eigenvectors/scale[:,numpy.newaxis]
+        projections = numpy.dot(numpy.transpose(symmetricvectors), rhs)
+        slow = self.eigenvalues < self.sortedeigenvalues[0]
+        solution = numpy.dot(symmetricvectors[:,slow], projections[slow]/self.eigenvalues[slow])
+        rhs = rhs - numpy.dot(symmetricvectors, projections)
+        fast, info = scipy.sparse.linalg.cg(-self.symmetrizeRateMatrix(scale), -rhs)
+        if info != 0:
+            print "Warning: flux calculation did not converge (cg info " + str(info) + ")"
+        return (solution+fast)*scale
+
+    def calculateFluxes(self, initialconcentrations, coefficients, endTime, equilibriumFlux):
+        # fluxes[i,j] = K[j,i]*a[i]-K[i,j]*a[j], where a is the integral of c(t)-c(infinity),
+        # a = sum over the modes m (without the equilibrium one) of c_m/-ev_m*v_m,
+        # so only connected microstates have a flux
+        if self.eigenvectors.shape[0] != self.eigenvectors.shape[1]:
+            amplitudes = self.integratedConcentrations(initialconcentrations[:,0], coefficients, endTime, equilibriumFlux)
+        else:
+            equilibrium = self.eigenvalues == self.sortedeigenvalues[0]
+            ev = numpy.where(equilibrium, -1.0, self.eigenvalues)
+            weights = numpy.where(equilibrium, 0.0, coefficients[:,0]/-ev)
+            if not equilibriumFlux:
+                weights = weights*(1-numpy.exp(ev*float(endTime)))
+            amplitudes = numpy.dot(self.eigenvectors, weights)
+        ratematrix = self.ratematrix
+        if scipy.sparse.issparse(ratematrix):
+            return (ratematrix.transpose().multiply(amplitudes[:,numpy.newaxis]) - ratematrix.multiply(amplitudes[numpy.newaxis,:])).tocsr()
+        return numpy.transpose(ratematrix)*amplitudes[:,numpy.newaxis] - ratematrix*amplitudes[numpy.newaxis,:]
+
+def subsampleWindow(window):
+    # Statistical inefficiency and uncorrelated snapshots of one umbrella window,
+    # from its Q and internal energy series. Module level, so it can run in a pool
+    Q_n, U_n, subsample = window
+    g = max(statisticalInefficiency(Q_n), statisticalInefficiency(U_n))
+    if subsample:
+        return g, uncorrelatedIndices(len(Q_n), g)
+    return g, numpy.arange(len(Q_n))
+
+activeModel = None
+
+def analyzeTemperature(temperature):
+    # Module level, so the pool workers can run it on the model they were forked with
+    return activeModel.analyzeTemperature(temperature)
+
+class KineticModel:
+    #########
+    # Files #
+    #########
+    # The metadata file, containing links to the dump files and Qw/Potential energy
+    # files. The format is: dumpfile qw-pot-file temperature kbias biasing-value
+    metadataFile = './metadata'
+    # Foldon file: each line contains the residues in a foldon
+    # each residue in the protein should be included once and only once
+    foldonFile = './foldons'
+    # The dump file (LAMMPS format) of the native structure coordinates
+    nativeDumpFile = './dump.native'
+    # Overall rate file
+    overallRateFile = './overallrates'
+    # Snapshot store: trajectories.npz holds the per snapshot data of all
+    # trajectories, trajectories.<k>.npy the coordinates of trajectory k
+    trajectoriesstorefile = './trajectories'
+    # Microstate codes of all snapshots
+    microstatesfile = './microstates.npz'
+    # Uncorrelated snapshots of every trajectory
+    subsamplefile = './subsample.npz'
+    # Dimensionless free energies of the umbrella simulations solved by MBAR
+    mbarfile = './mbar.npz'
+    # Cache of the microstate free energies of every temperature
+    pmfCacheDirectory = './pmfcache'
+    # Microstate ranks file prefix
+    microstateInfoFilePrefix = './microstateinfo'
+    # Eigenvalue debugging
+    eigenvaluesoutfile = './eigenvalueratio.dat'
+
+    ##############
+    # Parameters #
+    ##############
+    # Which type of Q calculation do you want to use? QC (a contact Q) or QW (a sum of gaussians)?
+    qType = 'QW'
+    # Which atom type to consider for contacts? CA or CB?
+    atomType = 'CA'
+    # Native contact threshold, in Angstroms, to be applied to Ca-Ca distances:
+    nativeContactThreshold = 8.0
+    # Contact factor: two residues are in contact if their distances is less than contactFactor*nativedistance (only used for qType = 'QC')
+    contactFactor = 1.2
+    # Include interface contacts? If False, only those native contacts for residues within the same foldon will be used
+    includeInterfaceContacts = False
+    # Minimum sequence separation for two residues in contact
+    minSeqSep = 3
+    # Foldon foldedness threshold
+    foldonThreshold = 0.6
+    # Downhill rate
+    k0 = 1000000
+    # Folding temperature, folding calculation below it and unfolding above it
+    foldingtemperature = 300
+    # Minimum temperature for computing overall rate
+    starttemp = 250
+    # Maximum temperature for computing overall rate
+    endtemp = 300
+    # Temperature incremement
+    tempinc = 1
+    # output microstate information for each temperature?
+    outputMicrostateInfo = True
+    # The frequency at which to accept snapshots from the dump file
+    snapshotFreq = 1
+    # Always output rate matrix?
+    alwaysOutputRateMatrix = True
+    # Calculate time evolution and fluxes?
+    calculateTimeEvolutionAndFluxes = True
+    # Automatically determine folding or unfolding simulation?
+    autoDetermineFoldingOrUnfolding = True # folding if below the folding temperature, unfolding if above
+    # Folding or unfolding simulation for calulating fluxes, not used if autoDetermineFoldingOrUnfolding = True
+    foldingSimulation = True # if false, assume unfolding
+    # Time range and time step for calculating evolution and fluxes
+    startTime = 0 # time evolution will start at this time
+    endTime = 0.0001 # time evolution will end at this time and the integrated flux will be calculated
+    timeStep = 0.00001 # the concentration of the states will be calculated this often
+    # Automatically determine time evolution interval?
+    autoDetermineEvolutionInterval = True # if True, startTime, endTime and timeStep (above) are not used
+    numTimeSteps = 100 # number of points to plot on time evolution if the interval is automatically determined
+    numRelaxationTimes = 5 # number of relaxation times (negative inverse of the smallest nonzero eigenvalue) to integrate out to
+    # Show graphical evolution of concentration of states?
+    graphicalEvolution = False
+    # Output the net flux between connected states at every time point?
+    outputFluxEvolution = False
+    # Calculate equilibrium flux? Otherwise, calculate net flux at end of time evolution
+    calculateEquilibriumFlux = True
+    # Use a sparse rate matrix? Needed for models with many foldons
+    sparseRateMatrix = False
+    # Number of slowest relaxation modes (including the equilibrium one) computed for a sparse rate matrix, at least 3
+    numEigenmodes = 10
+
+    # Time saving variables
+    # Number of processes for the window subsampling and the temperature loop
+    numProcesses = 1
+    # Cache the microstate free energies of every temperature in pmfCacheDirectory?
+    cachePMFs = True
+
+    # MBAR parameters
+    subsample = False # subsample the umbrella sampled data by first calculating the autocorrelation time for that simulation
+                      # otherwise, just use every sample
+
+    def __init__(self, **parameters):
+        for name in parameters:
+            setattr(self, name, parameters[name])
+
+    def temperatures(self):
+        return range(self.starttemp,self.endtemp+1,self.tempinc)
+
+    def run(self):
+        print "Folding temperature: " + str(self.foldingtemperature)
+        self.readNative()
+        self.readTrajectories()
+        self.assignMicrostates()
+        self.subsampleTrajectories()
+        self.findAllUstates()
+        self.initializeMBAR()
+        self.sweepTemperatures()
+        self.writeResults()
+
+    def readNative(self):
+        # read in native coordinates for the purposes of computing contacts
+        print "Reading native dump file..."
+        nativecoords = readDumpFile(self.nativeDumpFile, self.atomType)[0]
+        # calculate native distances
+        print "Calculating native distances..."
+        self.nativedistances = pairwiseDistances(nativecoords)
+        # Find native contacts
+        print "Finding native contacts..."
+        self.nativecontactlist = findNativeContacts(self.nativedistances, self.nativeContactThreshold, self.minSeqSep)
+        # read in the foldon definitions
+        print "Reading foldon file..."
+        self.foldons = readFoldonFile(self.foldonFile)
+        self.numfoldons = len(self.foldons)
+        self.foldoncontacts = sortNativeContactsByFoldon(self.foldons, self.nativecontactlist, self.includeInterfaceContacts)
+
+    def readTrajectories(self):
+        # Snapshot store stage, depends on the metadata, dump and data files
+        metadata = []
+        stamps = [fileDigest(self.metadataFile), self.snapshotFreq, self.atomType]
+        f = open(self.metadataFile, 'r')
+        for line in f:
+            line = line.split()
+            if len(line) == 0 or line[0] == "#":
+                continue
+            metadata.append(line)
+            stamps += fileStamp(line[0]) + fileStamp(line[1])
+        f.close()
+        self.trajectorieskey = stageKey(*stamps)
+
+        store = loadStage(self.trajectoriesstorefile + ".npz", self.trajectorieskey)
+        if store is None:
+            print "Reading all trajectories..."
+            data = []
+            numSnapshots = []
+            for k in range(len(metadata)):
+                print "Creating trajectory for " + metadata[k][0] + " ..."
+                coords = readDumpFile(metadata[k][0], self.atomType, self.snapshotFreq)
+                # Only one trajectory is kept in memory, the others are memory mapped from the store
+                numpy.save(self.trajectoriesstorefile + "." + str(k) + ".npy", coords)
+                numSnapshots.append(len(coords))
+                data.append(readSnapshotDataFile(metadata[k][1], len(coords), self.snapshotFreq))
+            data = numpy.concatenate(data)
+            print "Saving trajectories..."
+            saveStage(self.trajectoriesstorefile + ".npz", self.trajectorieskey,
+                      numSnapshots=numpy.array(numSnapshots, numpy.int64),
+                      Q=data[:,0], internalenergy=data[:,1], biasingenergy=data[:,2], samplingtemperature=data[:,3],
+                      simulationtemperature=numpy.array([float(line[2]) for line in metadata]),
+                      Kbias=numpy.array([float(line[3]) for line in metadata]),
+                      biasing_value=numpy.array([float(line[4]) for line in metadata]))
+            store = numpy.load(self.trajectoriesstorefile + ".npz")
+        else:
+            print "Loading trajectories..."
+
+        self.K = len(store['numSnapshots'])
+        self.numSnapshots = store['numSnapshots']
+        self.offsets = numpy.concatenate([[0], numpy.cumsum(self.numSnapshots)])
+        self.Q = store['Q']
+        self.internalenergy = store['internalenergy']
+        self.biasingenergy = store['biasingenergy']
+        self.simulationtemperature = store['simulationtemperature']
+        self.Kbias = store['Kbias']
+        self.biasing_value = store['biasing_value']
+
+    def coordinates(self, k):
+        return numpy.load(self.trajectoriesstorefile + "." + str(k) + ".npy", mmap_mode='r')
+
+    def assignMicrostates(self):
+        # Microstate stage, depends on the trajectories, the native structure and the foldons
+        self.microstateskey = stageKey(self.trajectorieskey, fileDigest(self.nativeDumpFile), self.foldons,
+                                       self.qType, self.nativeContactThreshold, self.contactFactor,
+                                       self.includeInterfaceContacts, self.minSeqSep, self.foldonThreshold)
+        stage = loadStage(self.microstatesfile, self.microstateskey)
+        if stage is None:
+            print "Assigning microstates..."
+            ustate = []
+            for k in range(self.K):
+                ustate.append(assignUstates(self.coordinates(k), self.foldoncontacts, self.nativedistances, self.qType,
+                                            self.contactFactor, self.minSeqSep, self.foldonThreshold))
+            saveStage(self.microstatesfile, self.microstateskey, ustate=numpy.concatenate(ustate))
+            stage = numpy.load(self.microstatesfile)
+        else:
+            print "Loading microstates..."
+        self.ustate = stage['ustate']
+
+    def subsampleTrajectories(self):
+        # Subsampling stage, depends on the trajectories only
+        self.subsamplekey = stageKey(self.trajectorieskey, self.subsample, 'fft')
+        stage = loadStage(self.subsamplefile, self.subsamplekey)
+        if stage is None:
+            print "Subsampling trajectories..."
+            windows = []
+            for k in range(self.K):
+                frames = slice(self.offsets[k], self.offsets[k+1])
+                windows.append((self.Q[frames], self.internalenergy[frames], self.subsample))
+            if self.numProcesses > 1:
+                pool = Pool(self.numProcesses)
+                results = pool.map(subsampleWindow, windows)
+                pool.close()
+                pool.join()
+            else:
+                results = map(subsampleWindow, windows)
+            indices = []
+            N_k = numpy.zeros([self.K], numpy.int32)
+            g_k = numpy.zeros([self.K], numpy.float64)
+            for k in range(self.K):
+                g_k[k], uncorrelated = results[k]
+                N_k[k] = len(uncorrelated) # number of uncorrelated samples
+                print "k = %5d : g = %.1f, N_uncorr = %d" % (k, g_k[k], N_k[k])
+                indices.append(self.offsets[k] + uncorrelated)
+            saveStage(self.subsamplefile, self.subsamplekey, N_k=N_k, g_k=g_k, indices=numpy.concatenate(indices))
+            stage = numpy.load(self.subsamplefile)
+        else:
+            print "Loading subsampled trajectories..."
+
+        self.N_k = stage['N_k']
+        self.N_max = int(self.N_k.max())
+        indices = stage['indices']
+        offsets = numpy.concatenate([[0], numpy.cumsum(self.N_k)])
+        self.qw_kn = numpy.zeros([self.K,self.N_max], numpy.float32)
+        self.U_kn = numpy.zeros([self.K,self.N_max], numpy.float32)
+        self.UB_kn = numpy.zeros([self.K,self.N_max], numpy.float32)
+        self.ustate_kn = -1 * numpy.ones([self.K,self.N_max], numpy.int32)
+        for k in range(self.K):
+            uncorrelated = indices[offsets[k]:offsets[k+1]]
+            N = self.N_k[k]
+            self.qw_kn[k,0:N] = self.Q[uncorrelated]
+            self.U_kn[k,0:N] = self.internalenergy[uncorrelated]
+            self.UB_kn[k,0:N] = self.biasingenergy[uncorrelated]
+            self.ustate_kn[k,0:N] = self.ustate[uncorrelated]
+
+    def findAllUstates(self):
+        # find all the microstates present, as sorted integer codes
+        print "Finding all microstates..."
+        self.microstatecodes = numpy.unique(numpy.concatenate([self.ustate_kn[k,0:self.N_k[k]] for k in range(self.K)]))
+        self.binmicrostatecodes = [binaryfoldonstate(int(code), self.numfoldons) for code in self.microstatecodes]
+        print "Microstate codes: " + str(self.binmicrostatecodes)
+        self.nbins = len(self.microstatecodes)
+        # Bin data
+        self.bin_kn = -1 * numpy.ones([self.K,self.N_max], numpy.int32) # bin_kn[k,n] is bin index of sample n from simulation k; otherwise -1
+        for k in range(self.K):
+            N = self.N_k[k]
+            self.bin_kn[k,0:N] = numpy.searchsorted(self.microstatecodes, self.ustate_kn[k,0:N])
+        # Make sure all bins are populated.
+        print "Counting number of samples per bin..."
+        bin_counts = numpy.zeros([self.nbins], numpy.int32)
+        for k in range(self.K):
+            bin_counts += numpy.bincount(self.bin_kn[k,0:self.N_k[k]], minlength=self.nbins).astype(numpy.int32)
+        print "Number of samples per microstate code: " + str(bin_counts)
+
+    def microstateIndex(self, code):
+        index = numpy.searchsorted(self.microstatecodes, code)
+        if index == len(self.microstatecodes) or self.microstatecodes[index] != code:
+            print "Microstate " + binaryfoldonstate(code, self.numfoldons) + " was not sampled"
+            sys.exit()
+        return index
+
+    def computeReducedEnergies(self, chunksize=1<<22):
+        # Compute reduced potentials from all simulations in all thermodynamic states,
+        # beta_l*(U_kn + Kbias_l/2*(qw_kn-biasing_value_l)^2). All states l are
+        # broadcast at once, in blocks of about chunksize values when K is large
+        print "Computing reduced potentials..."
+        K = self.K
+        u_kln = numpy.zeros([K,K,self.N_max], numpy.float32) # u_kln[k,l,n] is reduced biased potential of uncorrelated snapshot n from simulation k in thermodynamic state l
+        beta = 1.0 / (kb * numpy.asarray(self.simulationtemperature, numpy.float64))[:,numpy.newaxis] # inverse temperatures (in 1 / (kcal/mol))
+        halfKbias = numpy.asarray(self.Kbias, numpy.float64)[:,numpy.newaxis]/2.0
+        biasing_value = numpy.asarray(self.biasing_value, numpy.float64)[:,numpy.newaxis]
+        for k in range(K):
+            N = self.N_k[k] # number of uncorrelated snapshots
+            U_n = self.U_kn[k,0:N].astype(numpy.float64)
+            qw_n = self.qw_kn[k,0:N].astype(numpy.float64)
+            step = max(1, chunksize/max(N, 1))
+            for start in range(0, K, step):
+                l = slice(start, start+step)
+                u_kln[k,l,0:N] = beta[l] * (U_n + halfKbias[l] * (qw_n - biasing_value[l])**2)
+
+        return u_kln
+
+    def initializeMBAR(self):
+        # MBAR stage, depends on the subsampled trajectories. The solved free
+        # energies are saved, a new MBAR object starts from them
+        print "Computing reduced energies of all samples in all states..."
+        u_kln = self.computeReducedEnergies()
+        self.mbarkey = stageKey(self.subsamplekey, kb)
+        stage = loadStage(self.mbarfile, self.mbarkey)
+        if stage is None:
+            print "Initializing MBAR for the calculation of free energies..."
+            self.mbar = pymbar.MBAR(u_kln, self.N_k)
+            saveStage(self.mbarfile, self.mbarkey, f_k=numpy.asarray(self.mbar.f_k, numpy.float64))
+        else:
+            print "Loading MBAR free energies..."
+            self.mbar = pymbar.MBAR(u_kln, self.N_k, initial_f_k=stage['f_k'])
+
+    def reducedPotentials(self, temperature):
+        # Compute perturbed reduced potential at temperature of interest in absence of biasing potential.
+        u_kn = numpy.zeros([self.K,self.N_max], numpy.float32) # u_kn[k,n] is the unbiased reduced potential energy of snapshot n of umbrella simulation k at conditions of interest
+        kT = kb * temperature
+        beta = 1.0 / kT # reduced temperature
+        for k in range(self.K):
+            N = self.N_k[k]
+            u_kn[k,0:N] = beta * self.U_kn[k,0:N] # unbiased reduced potential at desired temperature
+        return u_kn
+
+    def pmfCacheFile(self, u_kn):
+        # Keyed by the MBAR stage and the reduced potentials and bins of all samples. The
+        # free energies of a loaded MBAR are solved again and differ in the last bits, so
+        # they are left out, the stage key already covers everything they depend on
+        key = hashlib.sha1()
+        key.update(self.mbarkey)
+        for array in [numpy.asarray(self.N_k), u_kn, self.bin_kn, numpy.array([self.nbins])]:
+            key.update(numpy.ascontiguousarray(array).tostring())
+        return os.path.join(self.pmfCacheDirectory, "pmf." + key.hexdigest() + ".npz")
+
+    def calculatePMF(self, temperature):
+        # Microstate free energies (in kT) at temperature, cached on disk in pmfCacheFile
+        print "Computing perturbed reduced potential at temperature of interest..."
+        u_kn = self.reducedPotentials(temperature)
+        if self.cachePMFs:
+            cachefile = self.pmfCacheFile(u_kn)
+            if os.path.exists(cachefile):
+                print "Loading cached microstate free energies..."
+                cache = numpy.load(cachefile)
+                return cache['f_i'], cache['df_i']
+        (f_i, df_i) = self.mbar.computePMF(u_kn, self.bin_kn, self.nbins)  # Compute PMF in unbiased potential (in units of kT).
+        if self.cachePMFs:
+            tmpfile = cachefile[:-4] + "." + str(os.getpid()) + ".npz"
+            numpy.savez(tmpfile, f_i=f_i, df_i=df_i)
+            os.rename(tmpfile, cachefile)
+        return f_i, df_i
+
+    def sweepTemperatures(self):
+        # loop over all desired (extrapolated) temperatures, compute overall rate
+        global activeModel
+        activeModel = self
+        if self.cachePMFs:
+            if not os.path.isdir(self.pmfCacheDirectory):
+                os.makedirs(self.pmfCacheDirectory)
+            cached = [os.path.exists(self.pmfCacheFile(self.reducedPotentials(temperature))) for temperature in self.temperatures()]
+            print "Cached microstate free energies: " + str(sum(cached)) + " of " + str(len(cached)) + " temperatures"
+        if self.numProcesses > 1:
+            # The pool is forked after MBAR is initialized, the workers share it read-only
+            pool = Pool(self.numProcesses)
+            results = pool.map(analyzeTemperature, self.temperatures())
+            pool.close()
+            pool.join()
+        else:
+            results = map(analyzeTemperature, self.temperatures())
+        self.overallrates = []
+        self.ustateinfo = []
+        eigenvaluesfile = open(self.eigenvaluesoutfile,'w')
+        for overallrate, info, eigenvalueratios in results:
+            self.overallrates.append(overallrate)
+            self.ustateinfo.append(info)
+            eigenvaluesfile.write(eigenvalueratios)
+        eigenvaluesfile.close()
+
+    def analyzeTemperature(self, temperature):
+        # Rate matrix, eigenmodes, time evolution and fluxes at one temperature.
+        # This also runs in the pool workers, so the results are returned
+        eigenvaluesout = cStringIO.StringIO()
+        print "Microstate codes: " + str(self.binmicrostatecodes)
+        print "Calculating rate for temperature: " + str(temperature)
+        # calculate microstate free energies for a certain temperature
+        print "Calculating microstate free energies..."
+        (microstatefreeenergies, microstateuncertainties) = self.calculatePMF(temperature)
+        print "Microstate free energies: " + str(microstatefreeenergies)
+        # calculate rate matrix, given a temperature
+        print "Calculating rate matrix..."
+        model = RateModel(self.microstatecodes, microstatefreeenergies, self.numfoldons, self.k0, self.sparseRateMatrix, self.numEigenmodes)
+        if(self.alwaysOutputRateMatrix):
+            saveMatrix('ratematrix'+str(temperature),model.ratematrix)
+        print "Rate Matrix: \n" + str(model.ratematrix)
+        # calculate microstate info
+        info = []
+        ranks = popcount(self.microstatecodes, self.numfoldons)
+        for i in range(len(self.microstatecodes)):
+            info.append([self.binmicrostatecodes[i],ranks[i],microstatefreeenergies[i]])
+        ustatestabilitygap = findUstateStabilityGap(ranks, microstatefreeenergies, ranks.min(), ranks.max())
+        # calculate eigenvalues and eigenvectors
+        print "Calculating eigenvalues and eigenvectors"
+        model.calculateEigenvectorsEigenvalues(eigenvaluesout)
+        sortedeigenvalues = model.sortedeigenvalues
+        print "Eigenvalues: \n" + str(sortedeigenvalues)
+        print "Eigenvectors: \n " + str(model.sortedeigenvectors)
+        overallrate = [temperature,ustatestabilitygap,numpy.log(-1*sortedeigenvalues[1]),numpy.log(-1*sortedeigenvalues[2])]
+        #############################################
+        # Begin time evolution and flux calculation #
+        #############################################
+        if(self.calculateTimeEvolutionAndFluxes):
+            self.evolve(model, temperature)
+
+        return overallrate, info, eigenvaluesout.getvalue()
+
+    def evolve(self, model, temperature):
+        startTime = self.startTime
+        endTime = self.endTime
+        timeStep = self.timeStep
+        numTimeSteps = self.numTimeSteps
+        if(self.autoDetermineEvolutionInterval):
+            startTime = 0.0
+            endTime = self.numRelaxationTimes*(1/-model.sortedeigenvalues[1])
+            timeStep = (endTime-startTime)/numTimeSteps
+        else:
+            numTimeSteps = int((endTime-startTime)/timeStep)
+        print "Starting time evolution and flux calculation..."
+        print "Start time: %s\n" % str(startTime)
+        print "End time: %s\n" % str(endTime)
+        print "Time step: %s\n" % str(timeStep)
+        foldingSimulation = self.foldingSimulation
+        if(self.autoDetermineFoldingOrUnfolding):
+            print "Determining if this will be a folding or unfolding calculation based on folding temperature..."
+            if(temperature < self.foldingtemperature):
+                print "Starting folding calculation..."
+                foldingSimulation = True
+            else:
+                print "Starting unfolding calculation..."
+                foldingSimulation = False
+        print "Setting initial concentrations..."
+        initialconcentrations = numpy.zeros(len(self.microstatecodes))
+        if(foldingSimulation):
+            initialconcentrations[self.microstateIndex(0)] = 1.0
+        else:
+            initialconcentrations[self.microstateIndex(pow(2,self.numfoldons)-1)] = 1.0
+        initialconcentrations = initialconcentrations[:,numpy.newaxis]
+        print "Initial concentrations: \n%s\n" % str(initialconcentrations)
+        coefficients = model.calculateCoefficients(initialconcentrations)
+        print "Coefficents: \n%s\n" % str(coefficients)
+        print "Calculating time evolution..."
+        times = floatRange(startTime,endTime,timeStep)[:numTimeSteps]
+        concentrations = numpy.zeros((len(self.microstatecodes),numTimeSteps))
+        concentrations[:,0:len(times)] = model.calculateConcentrations(coefficients, times)
+        numpy.savetxt('concentrations'+str(temperature),concentrations.transpose())
+        if(self.graphicalEvolution):
+            for timeIndex in range(len(times)):
+                print "Concentration of states:"
+                for state in range(len(self.microstatecodes)):
+                    print str(self.binmicrostatecodes[state]) + ": " + int(concentrations[state,timeIndex]*100)*'#'
+                timefunctions.sleep(0.1)
+        if(self.outputFluxEvolution):
+            rows, cols, fluxevolution = model.calculateFluxEvolution(concentrations[:,0:len(times)])
+            header = "time " + " ".join([self.binmicrostatecodes[i]+"->"+self.binmicrostatecodes[j] for i, j in zip(rows, cols)])
+            numpy.savetxt('fluxevolution'+str(temperature), numpy.column_stack((times, fluxevolution)), header=header)
+
+        # calculate integrated flux at the end of the time evolution
+        fluxes = model.calculateFluxes(initialconcentrations, coefficients, endTime, self.calculateEquilibriumFlux)
+
+        print "Fluxes: \n%s\n" % str(fluxes)
+        saveMatrix('fluxes'+str(temperature),fluxes)
+        cPickle.dump(fluxes, open('fluxes'+str(temperature)+'.pkl', 'wb'))
+
+    def writeResults(self):
+        f = open(self.overallRateFile, 'w')
+        f.write("# temperature stability-gap first-rate second-rate\n")
+        for i in range(len(self.overallrates)):
+            f.write("%f %f %e %e \n" % (self.overallrates[i][0],self.overallrates[i][1],self.overallrates[i][2],self.overallrates[i][3]))
+        f.close()
+
+        if self.outputMicrostateInfo:
+            temperatures = self.temperatures()
+            for t in range(len(temperatures)):
+                f = open(self.microstateInfoFilePrefix + "." + str(temperatures[t]), 'w')
+                f.write("# macrobasin rank free-energy-in-kT\n")
+                ustateinformation = self.ustateinfo[t]
+                for index in range(len(ustateinformation)):
+                    f.write("%s %d %f \n" % (ustateinformation[index][0], ustateinformation[index][1], ustateinformation[index][2]))
+                f.close()
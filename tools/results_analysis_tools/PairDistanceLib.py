@@ -0,0 +1,168 @@
+#!/usr/bin/python
+
+# ----------------------------------------------------------------------
+# Binary store for the pair distance time series written by
+# compute pairdistmat ("timestep N" followed by size lines of size
+# distances per snapshot). The text is read once, in a single streaming
+# pass, and written in chunks of snapshots to a temporary file, pair by
+# pair within a chunk. The chunks are then joined in blocks of pairs into
+# the binary store, where the series of every pair is contiguous:
+#
+#   header (32 bytes): 'PDST', version, size, number of snapshots
+#   distances: size*(size-1)/2 x snapshots float32, the pairs i<j ordered
+#              diagonal by diagonal, i.e. by j-i and then by i
+#   timesteps: snapshots int64
+#
+# The analysis scripts memory map the distances instead of parsing text,
+# and read the series of a block of pairs of neighbouring separations
+# from one contiguous range of the file.
+# ----------------------------------------------------------------------
+
+import os
+import struct
+import numpy
+
+magic = 'PDST'
+version = 2
+headerformat = '=4siiq12x'
+headersize = struct.calcsize(headerformat)
+
+def storeFileName(datafile):
+    return datafile + '.pds'
+
+def isStoreFile(filename):
+    f = open(filename, 'rb')
+    start = f.read(4)
+    f.close()
+    return start == magic
+
+def storeVersion(filename):
+    f = open(filename, 'rb')
+    start, fileversion = struct.unpack(headerformat, f.read(headersize))[0:2]
+    f.close()
+    return fileversion
+
+def pairIndex(size, rows, columns):
+    # row of the pairs (rows[k], columns[k]), rows < columns, in the diagonal by diagonal order
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    seps = numpy.asarray(columns, dtype=numpy.int64) - rows
+    return (seps-1)*size - (seps-1)*seps/2 + rows
+
+def diagonalOrder(size):
+    # (rows, columns) of the upper triangle of a size x size matrix, diagonal by diagonal
+    rows = numpy.concatenate([numpy.arange(size-sep) for sep in range(1, size)])
+    seps = numpy.concatenate([numpy.repeat(sep, size-sep) for sep in range(1, size)])
+    return rows, rows+seps
+
+def joinChunks(tmpfile, out, npairs, snapshots, chunksnapshots, blockvalues=1<<24):
+    # writes the pair x snapshots matrix of the chunks in tmpfile, each of them pairs x
+    # snapshots of the chunk, in blocks of pairs read with one contiguous read per chunk
+    if npairs*snapshots == 0:
+        return
+    chunks = numpy.memmap(tmpfile, dtype=numpy.float32, mode='r', shape=(npairs*snapshots,))
+    step = max(1, blockvalues/max(1, snapshots))
+    for start in range(0, npairs, step):
+        stop = min(npairs, start+step)
+        block = numpy.empty((stop-start, snapshots), dtype=numpy.float32)
+        for first in range(0, snapshots, chunksnapshots):
+            length = min(chunksnapshots, snapshots-first)
+            offset = first*npairs
+            block[:, first:first+length] = chunks[offset+start*length:offset+stop*length].reshape(stop-start, length)
+        block.tofile(out)
+    del chunks
+
+def ingestPairDistances(datafile, storefile, chunksnapshots=1024):
+    # convert the text file in one pass, chunksnapshots snapshots are buffered at a time
+    inp = open(datafile, 'r')
+    tmp = open(storefile + '.chunks', 'wb')
+    size = 0
+    order = None
+    snapshots = 0
+    timesteps = []
+    chunk = []
+    lines = []
+
+    def snapshotDistances(lines):
+        values = numpy.array(' '.join(lines).split(), dtype=numpy.float32)
+        if len(values) != size*size:
+            raise ValueError("Snapshot %d of %s has %d distances instead of %d" % (len(timesteps)-1, datafile, len(values), size*size))
+        return values.reshape(size, size)[order]
+
+    for line in inp:
+        fields = line.split()
+        if len(fields) == 0:
+            continue
+        if fields[0] == 'timestep':
+            if len(lines) > 0:
+                chunk.append(snapshotDistances(lines))
+                lines = []
+                if len(chunk) >= chunksnapshots:
+                    numpy.array(chunk, dtype=numpy.float32).T.tofile(tmp)
+                    snapshots += len(chunk)
+                    chunk = []
+            timesteps.append(int(fields[1]))
+            continue
+        if size == 0:
+            size = len(fields)
+            order = diagonalOrder(size)
+        lines.append(line)
+    if len(lines) > 0:
+        chunk.append(snapshotDistances(lines))
+    if len(chunk) > 0:
+        numpy.array(chunk, dtype=numpy.float32).T.tofile(tmp)
+        snapshots += len(chunk)
+    inp.close()
+    tmp.close()
+
+    out = open(storefile + '.tmp', 'wb')
+    out.write(struct.pack(headerformat, magic, version, size, snapshots))
+    joinChunks(storefile + '.chunks', out, size*(size-1)/2, snapshots, chunksnapshots)
+    numpy.array(timesteps[:snapshots], dtype=numpy.int64).tofile(out)
+    out.close()
+    os.remove(storefile + '.chunks')
+    os.rename(storefile + '.tmp', storefile)
+
+class PairDistanceStore:
+    size = 0
+    snapshots = 0
+    npairs = 0
+
+    def __init__(self, storefile):
+        f = open(storefile, 'rb')
+        start, fileversion, self.size, self.snapshots = struct.unpack(headerformat, f.read(headersize))
+        f.close()
+        if start != magic:
+            raise ValueError("%s is not a pair distance store" % storefile)
+        if fileversion != version:
+            raise ValueError("%s is a version %d pair distance store, version %d is needed, convert the data file again" % (storefile, fileversion, version))
+        self.npairs = self.size*(self.size-1)/2
+        # distances[pairIndex(size, i, j), snapshot] is the distance of residues i < j.
+        # Empty arrays cannot be memory mapped
+        if self.npairs*self.snapshots > 0:
+            self.distances = numpy.memmap(storefile, dtype=numpy.float32, mode='r', offset=headersize, shape=(self.npairs, self.snapshots))
+        else:
+            self.distances = numpy.zeros((self.npairs, self.snapshots), dtype=numpy.float32)
+        if self.snapshots > 0:
+            self.timesteps = numpy.memmap(storefile, dtype=numpy.int64, mode='r', offset=headersize+4*self.snapshots*self.npairs, shape=(self.snapshots,))
+        else:
+            self.timesteps = numpy.zeros(0, dtype=numpy.int64)
+
+    def pairs(self, rows, columns):
+        # (snapshots x pairs) float32 time series of the pairs (rows[k], columns[k]).
+        # Consecutive pairs of the diagonal order are read as one contiguous range
+        index = pairIndex(self.size, rows, columns)
+        if len(index) > 0 and (numpy.diff(index) == 1).all():
+            return numpy.array(self.distances[index[0]:index[-1]+1]).T
+        return self.distances[index].T
+
+def openPairDistances(datafile):
+    # Opens a store file directly. A text file is converted on first use to
+    # datafile.pds, which is reused as long as it is newer than the text and
+    # written in the current version of the format
+    if isStoreFile(datafile):
+        return PairDistanceStore(datafile)
+    storefile = storeFileName(datafile)
+    if not os.path.exists(storefile) or os.path.getmtime(storefile) < os.path.getmtime(datafile) or storeVersion(storefile) != version:
+        print "Converting " + datafile + " to " + storefile + "..."
+        ingestPairDistances(datafile, storefile)
+    return PairDistanceStore(storefile)
@@ -1,33 +1,101 @@
 #!python
 
 import sys
-import math
-
-file=open(sys.argv[1])
-
-vecpts = []
-
-# read in file, store vector field as list of 6D points
-for line in file:
-    line = line.strip()
-    if line == "": continue
-    splitline = line.split()
-    vecpts.append([splitline[0],splitline[1],splitline[2],splitline[3],splitline[4],splitline[5]])
-    
-# loop over each pair of points
-for i in range(len(vecpts)):
-    for j in range(i+1,len(vecpts)):
-        # calculate displacement vector
-        lvec = [(float(vecpts[i][0])-float(vecpts[j][0])),(float(vecpts[i][1])-float(vecpts[j][1])),(float(vecpts[i][2])-float(vecpts[j][2]))]        
-        # calculate distance difference
-        distance = math.sqrt(lvec[0]**2+lvec[1]**2+lvec[2]**2)
-        print distance,
-        # calculate vector difference
-        vecdiff = [(float(vecpts[i][3])-float(vecpts[j][3])),(float(vecpts[i][4])-float(vecpts[j][4])),(float(vecpts[i][5])-float(vecpts[j][5]))]
-        # print vecdiff,
-        # calculate each structure function and print line with distance and each structure function
-        sfn1 = abs((vecdiff[0]*lvec[0]+vecdiff[1]*lvec[1]+vecdiff[2]*lvec[2])/distance)
-        sfn2 = sfn1**2
-        sfn3 = sfn1*sfn2
-        print sfn1,sfn2,sfn3    
+import numpy
+from multiprocessing import Pool
 
+# Structure functions of a vector field (as printed by CalcFlowField.py or
+# censorfield.py) binned by the distance between the points, rounded to the
+# nearest number of contacts. The output is the same as running the
+# per pair output of this script through collatestructuredata.py:
+# distance sfn1 sfn2 sfn3 skewness number-of-pairs
+
+# number of point pairs handled at once
+chunksize=1<<22
+
+if len(sys.argv)!=3 and len(sys.argv)!=5 or len(sys.argv)==5 and sys.argv[3]!="-np":
+    print "\n" + sys.argv[0] + " field_file distancerange [-np n]\n"
+    print "-np splits the point pairs over n worker processes\n"
+    sys.exit()
+
+distancerange=int(sys.argv[2])
+n_proc=1
+if len(sys.argv)==5: n_proc=int(sys.argv[4])
+
+# read in file, store vector field as an array of 6D points
+vecpts=[]
+for line in open(sys.argv[1]):
+    line = line.split()
+    if len(line) == 0: continue
+    vecpts.append([float(value) for value in line[0:6]])
+vecpts=numpy.array(vecpts).reshape(-1,6)
+positions=vecpts[:,0:3]
+vectors=vecpts[:,3:6]
+
+def binBlock(start):
+    # Sums of the structure functions and pair counts per distance bin for the pairs
+    # (i, j > i) with i in the block of rows that starts at start. Pairs beyond the
+    # distance range go to an extra last bin
+    rows=slice(start, min(start+step, len(positions)))
+    # calculate displacement vectors and distances, only the pairs with j > i are used
+    lvec=positions[rows,numpy.newaxis,:]-positions[numpy.newaxis,start:,:]
+    vecdiff=vectors[rows,numpy.newaxis,:]-vectors[numpy.newaxis,start:,:]
+    upper=numpy.arange(rows.stop-start)[:,numpy.newaxis] < numpy.arange(len(positions)-start)[numpy.newaxis,:]
+    lvec=lvec[upper]
+    vecdiff=vecdiff[upper]
+    distance=numpy.sqrt((lvec**2).sum(1))
+    # calculate the first structure function, the others are its powers
+    sfn1=numpy.abs((vecdiff*lvec).sum(1)/distance)
+    # bin the data by rounding the distance to the nearest number of contacts
+    bins=numpy.minimum(numpy.floor(distance+0.5).astype(numpy.int64), distancerange)
+    return (numpy.bincount(bins, minlength=distancerange+1),
+            numpy.bincount(bins, weights=sfn1, minlength=distancerange+1),
+            numpy.bincount(bins, weights=sfn1**2, minlength=distancerange+1),
+            numpy.bincount(bins, weights=sfn1**3, minlength=distancerange+1))
+
+# blocks of rows of about chunksize pairs each
+step=max(1, chunksize/max(1, len(positions)))
+starts=range(0, len(positions), step)
+if n_proc>1:
+    pool=Pool(n_proc)
+    blocks=pool.map(binBlock, starts)
+    pool.close()
+    pool.join()
+else:
+    blocks=map(binBlock, starts)
+
+numpts=numpy.zeros(distancerange+1, dtype=numpy.int64)
+sfn1=numpy.zeros(distancerange+1)
+sfn2=numpy.zeros(distancerange+1)
+sfn3=numpy.zeros(distancerange+1)
+for block in blocks:
+    numpts+=block[0]
+    sfn1+=block[1]
+    sfn2+=block[2]
+    sfn3+=block[3]
+if numpts[distancerange] > 0:
+    print str(numpts[distancerange]) + " point pairs are farther apart than the distance range " + str(distancerange)
+    sys.exit()
+numpts=numpts[0:distancerange]
+sfn1=sfn1[0:distancerange]
+sfn2=sfn2[0:distancerange]
+sfn3=sfn3[0:distancerange]
+
+# normalize by the number of points and calculate skewness
+sampled=numpts > 0
+skewness=numpy.zeros(distancerange)
+sfn1[sampled]=sfn1[sampled]/numpts[sampled]
+sfn2[sampled]=sfn2[sampled]/numpts[sampled]
+sfn3[sampled]=sfn3[sampled]/numpts[sampled]
+skewness[sampled]=sfn3[sampled]/numpy.power(sfn2[sampled],1.5)
+
+# print out results
+sfn1=sfn1.tolist()
+sfn2=sfn2.tolist()
+sfn3=sfn3.tolist()
+skewness=skewness.tolist()
+numpts=numpts.tolist()
+for i in range(distancerange):
+    # include the number of points in each distance range to indicate
+    # how well sampled each region is
+    print i,sfn1[i],sfn2[i],sfn3[i],skewness[i],numpts[i]
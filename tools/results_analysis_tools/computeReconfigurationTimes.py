@@ -3,256 +3,211 @@
 # and computes a matrix of autocorrelation functions and averages
 # these autocorrelation functions over sequence separation
 # to get reconfiguration times as a function of sequence separation.
+#
+# The text data file is converted once to a binary store (datafile.pds,
+# see PairDistanceLib.py) and the distances are memory mapped from there.
+# Pairs are ordered diagonal by diagonal, i.e. by sequence separation, as
+# in the store, so the series of a block of pairs are read from one
+# contiguous range of the file. The autocorrelation functions of a block
+# are computed with one FFT, and averaging over a separation is a sum over
+# a contiguous block.
+#
+# With -bootstrap n the decay times get confidence intervals from a moving
+# block bootstrap: n series as long as the original one are resampled from
+# random blocks of -blocklength snapshots (default 4*maxlag) and analyzed
+# like it, with -np worker processes.
 
 # Features to add:
 # * save data to files
 # * flexibly choose what data to save
 # * plot reconfiguration time versus sequence separation
 # * plot autocorrelation functions
-# * compute uncertainties for acfs and reconfiguration times
+# * compute uncertainties for acfs and the reconfiguration times of single pairs
 # * optionally specify number of snapshots to process
 # * flexibly specify separation range (e.g. range(1,5,20))
 
 # import necessary libraries
 import numpy
 import sys
-import commands
+from multiprocessing import Pool
+from PairDistanceLib import openPairDistances
+
+# number of values in the FFT work arrays of one block of pairs
+blocksize=1<<24
+# confidence level of the bootstrap intervals
+confidencelevel=0.95
+
+def diagonalPairs(size, minseqsep, maxseqsep):
+    # residue pairs (i, i+sep) for sep = minseqsep..maxseqsep, ordered diagonal by diagonal like the store
+    seps = numpy.concatenate([numpy.repeat(sep, size-sep) for sep in range(minseqsep, maxseqsep+1)])
+    rows = numpy.concatenate([numpy.arange(size-sep) for sep in range(minseqsep, maxseqsep+1)])
+    return rows, rows+seps, seps
+
+def autocorrelations(series, maxlag, blocklength=0):
+    # autocorrelation functions (maxlag x pairs) of the columns of series (snapshots x pairs),
+    # sum_t dA(t)*dA(t+tau)/(snapshots*variance), padded so the FFT does not wrap around.
+    # With a blocklength only lag products within consecutive blocks of that many snapshots
+    # (the last one may be shorter) are used, scaled to the number of products of an
+    # unbroken series. Pairs with zero variance get nan
+    snapshots = len(series)
+    fluctuations = numpy.asarray(series, dtype=numpy.float64)
+    fluctuations = fluctuations - fluctuations.mean(0)
+    variance = (fluctuations**2).sum(0)/(snapshots-1)
+    variance[variance == 0] = numpy.nan
+    if blocklength == 0:
+        blocklength = snapshots
+    nblocks = -(-snapshots/blocklength)
+    if nblocks*blocklength > snapshots:
+        # zero fluctuations after the end add no lag products
+        fluctuations = numpy.concatenate([fluctuations, numpy.zeros((nblocks*blocklength-snapshots, fluctuations.shape[1]))])
+    fluctuations = fluctuations.reshape(nblocks, blocklength, -1)
+    nfft = 1
+    while nfft < blocklength+maxlag:
+        nfft *= 2
+    transform = numpy.fft.rfft(fluctuations, nfft, axis=1)
+    acf = numpy.fft.irfft(transform.real**2+transform.imag**2, nfft, axis=1)[:,0:maxlag].sum(0)
+    tau = numpy.arange(maxlag, dtype=numpy.float64)[:,numpy.newaxis]
+    lengths = numpy.minimum(blocklength, snapshots-blocklength*numpy.arange(nblocks))
+    products = numpy.maximum(lengths[numpy.newaxis,:]-tau, 0).sum(1)[:,numpy.newaxis]
+    acf *= (snapshots-tau)/products
+    acf /= snapshots*variance
+    acf[0] = numpy.where(numpy.isnan(variance), numpy.nan, 1.0)
+    return acf
+
+def decayTimes(acf):
+    # sum of every autocorrelation function (columns of acf) before it first goes below zero,
+    # and whether it did go below zero within maxlag
+    positive = numpy.cumprod(acf >= 0, axis=0)
+    return (acf*positive).sum(0), positive[-1] == 0
+
+def separationAverages(indices=None, blocklength=0):
+    # autocorrelation functions averaged over sequence separation (size x maxlag) and the
+    # reconfiguration times of all pairs, from the snapshots in indices (all by default),
+    # which are made of independent blocks of blocklength snapshots if that is given
+    reconfigurationtimes=numpy.zeros((size,size))
+    sepaveragedautocorrarray=numpy.zeros((size,maxlag))
+    step=max(1, blocksize/snapshots)
+    for start in range(0, npairs, step):
+        block=slice(start, start+step)
+        series=store.pairs(rows[block], columns[block])
+        if indices is not None:
+            series=series[indices]
+        acf=autocorrelations(series, maxlag, blocklength)
+        if indices is None and numpy.isnan(acf[0]).any():
+            zero=numpy.nonzero(numpy.isnan(acf[0]))[0][0]
+            print "Zero variance at row " + str(rows[block][zero]) + ", column " + str(columns[block][zero])
+            print "Exiting..."
+            sys.exit()
+        reconfigurationtimes[rows[block],columns[block]]=decayTimes(acf)[0]
+        # sum over the pairs of each separation present in the block
+        blockseps=seps[block]
+        starts=numpy.nonzero(numpy.concatenate([[True], blockseps[1:] != blockseps[:-1]]))[0]
+        sepaveragedautocorrarray[blockseps[starts]] += numpy.add.reduceat(acf, starts, axis=1).T
+    sepaveragedautocorrarray /= (size-numpy.arange(size, dtype=numpy.float64))[:,numpy.newaxis]
+    return sepaveragedautocorrarray, reconfigurationtimes
+
+def bootstrapDecayTimes(replicate):
+    # decay times of one moving block bootstrap resample, seeded by its replicate number
+    # so the result does not depend on the worker that computes it. The resample is cut
+    # to the length of the data, so the last block may be shorter. The lags do not
+    # cross the block boundaries, which would cut the correlations short
+    random=numpy.random.RandomState(seed+replicate)
+    nblocks=-(-snapshots/blocklength)
+    starts=random.randint(0, snapshots-blocklength+1, nblocks)
+    indices=(starts[:,numpy.newaxis]+numpy.arange(blocklength)).ravel()[:snapshots]
+    sepaveragedautocorrarray=separationAverages(indices, blocklength)[0]
+    return decayTimes(sepaveragedautocorrarray[minseqsep:maxseqsep+1].T)[0]
 
 # check commad line arguments
-if len(sys.argv) != 3:
-    print "Usage: python computeReconfigurationTimes.py datafile maxlag"
+nbootstrap=0
+blocklength=0
+nproc=1
+seed=0
+del_list=[]
+for iarg in range(3, len(sys.argv)):
+    if sys.argv[iarg]=="-bootstrap":
+        nbootstrap=int(sys.argv[iarg+1])
+        del_list.insert(0, iarg)
+        del_list.insert(0, iarg+1)
+    if sys.argv[iarg]=="-blocklength":
+        blocklength=int(sys.argv[iarg+1])
+        del_list.insert(0, iarg)
+        del_list.insert(0, iarg+1)
+    if sys.argv[iarg]=="-np":
+        nproc=int(sys.argv[iarg+1])
+        del_list.insert(0, iarg)
+        del_list.insert(0, iarg+1)
+    if sys.argv[iarg]=="-seed":
+        seed=int(sys.argv[iarg+1])
+        del_list.insert(0, iarg)
+        del_list.insert(0, iarg+1)
+for idel in del_list:
+    sys.argv.pop(idel)
+
+if len(sys.argv) != 3 or nproc < 1:
+    print "Usage: python computeReconfigurationTimes.py datafile|storefile maxlag [-bootstrap n] [-blocklength n] [-np n] [-seed n]"
     sys.exit()
 
 # set system parameters
 maxlag=int(sys.argv[2]) # maximum lag time at which to compute autocorrelation
 print "maximum lag time to be computed: " + str(maxlag)
 
-# open the data file
-f=open(sys.argv[1],'r')
-
-# read in system size
-print "Reading system size..."
-size=0
-for line in f:
-    line=line.split()
-    if line[0] == 'timestep':
-        continue
-    
-    for element in line:
-        size += 1
-    
-    break
-
+# open the pair distance store, converting the data file on first use
+store=openPairDistances(sys.argv[1])
+size=store.size
 print "size:" + str(size)
 
 # set min and max sequence separation
 minseqsep=1 # at least 1
 maxseqsep=size-1 # at most size-1
 
-# read in number of snapshots
-print "Reading in number of snapshots..."
-snapshots=int(commands.getstatusoutput('grep timestep ' + sys.argv[1] + ' | wc -l')[1])
+snapshots=store.snapshots
 print "snapshots:" + str(snapshots)
 
 if maxlag > snapshots:
     print "Cannot have a maxlag greater than the number of snapshots."
     sys.exit()
 
-# close and reopen data file to read over again
-f.close()
-f=open(sys.argv[1],'r')
-
-# for debugging purposes
-testrow=10 
-testcolumn=15
-
-# build timeseries matrix
-print "Building timeseries matrix..."
-timeseries=[]
-for row in range(size):
-    timeseries.append([])
-    for column in range(size):
-        timeseries[row].append([])
-        for snapshot in range(snapshots):
-            timeseries[row][column].append([])
-
-# read in timeseries values
-print "Reading timeseries values..."
-row=0
-column=0
-snapshot=-1
-
-for line in f:
-    line=line.split()
-    if line[0] == 'timestep':
-        snapshot=snapshot+1
-        row=0
-        continue
-    
-    for element in line:
-        timeseries[row][column][snapshot]=element
-        column=column+1
-
-    row=row+1
-    column=0
-
-print timeseries[testrow][testcolumn]
-sys.exit()
-
-# build reconfiguration times matrix
-print "Building reconfiguration times matrix..."
-reconfigurationtimes=[]
-for row in range(size):
-    reconfigurationtimes.append([])
-    for column in range(size):
-        reconfigurationtimes[row].append(0.0)
-
-# build average matrix
-print "Building average matrix..."
-averagevalues=[]
-for row in range(size):
-    averagevalues.append([])
-    for column in range(size):
-        averagevalues[row].append([])
-
-# calculate average matrix
-print "Calculating average matrix..."
-for row in range(size):
-    for column in range(row,size):
-        average = 0
-        for snapshot in range(snapshots):
-            average += float(timeseries[row][column][snapshot])
-
-        averagevalues[row][column] = average/float(snapshots)
-
-# subtract all averages from all time series
-print "Subtracting average values..."
-for row in range(size):
-    for column in range(row,size):
-        for snapshot in range(snapshots):
-            timeseries[row][column][snapshot] = float(timeseries[row][column][snapshot])-averagevalues[row][column]
-
-# build variance matrix
-print "Building variance matrix..."
-variancevalues=[]
-for row in range(size):
-    variancevalues.append([])
-    for column in range(size):
-        variancevalues[row].append([])
-
-# calculate variance matrix
-print "Calculating variance matrix..."
-for row in range(size):
-    for column in range(row,size):
-        variance = 0
-        for snapshot in range(snapshots):
-            variance += pow(timeseries[row][column][snapshot],2)
-
-        variancevalues[row][column] = variance/(snapshots-1)
-
-# build autocorrelation matrix
-print "Building autocorrelation matrix..."
-autocorrelationvalues=[]
-for row in range(size):
-    autocorrelationvalues.append([])
-    for column in range(size):
-        autocorrelationvalues[row].append([])
-        for tau in range(maxlag):
-            autocorrelationvalues[row][column].append(0.0)
-
-# calculate autocorrelation matrix
-print "Calculating autocorrelation matrix..."
-for row in range(size):
-    for column in range(row,size):
-        if abs(row-column) > maxseqsep or abs(row-column) < minseqsep:
-            continue
-
-        for tau in range(maxlag):
-            for t in range(snapshots-tau):
-                autocorrelationvalues[row][column][tau] += timeseries[row][column][t]*timeseries[row][column][t+tau]
-
-        autocorrelationvalues[row][column][tau] /= float(maxlag-tau)
-
-for row in range(size):
-    for column in range(row,size):
-        if abs(row-column) > maxseqsep or abs(row-column) < minseqsep:
-            continue
-
-        for tau in range(maxlag):
-            if variancevalues[row][column] == 0:
-                print "Zero variance at row " + str(row) + ", column " + str(column)
-                print "Exiting..."
-                sys.exit()
-            if tau == 0:
-                autocorrelationvalues[row][column][tau]=1.0
-                continue
-
-            autocorrelationvalues[row][column][tau] /= snapshots*variancevalues[row][column]
-
-# calculate reconfiguration time matrix
-print "Calculating reconfiguration time matrix..."
-for row in range(size):
-    for column in range(row,size):
-        if abs(row-column) > maxseqsep or abs(row-column) < minseqsep:
-            continue
-
-        for tau in range(maxlag):
-            if autocorrelationvalues[row][column][tau] < 0:
-                break
-            
-            reconfigurationtimes[row][column] += autocorrelationvalues[row][column][tau]
-
-# build autocorrelation array averaged over separation
-print "Averaging autocorrelation functions over sequence separations..."
-sepaveragedautocorrarray=[]
-for sep in range(size):
-    sepaveragedautocorrarray.append([])
-    for tau in range(maxlag):
-        sepaveragedautocorrarray[sep].append(0.0)
+if blocklength == 0:
+    blocklength=min(4*maxlag, snapshots)
+if nbootstrap > 0 and (blocklength < maxlag or blocklength > snapshots):
+    print "The bootstrap block length has to be between maxlag and the number of snapshots."
+    sys.exit()
 
-# calculate autocorrelation array averaged over separation    
-for tau in range(maxlag):
-    for row in range(size):
-        for column in range(row,size):
-            sepaveragedautocorrarray[abs(row-column)][tau] += autocorrelationvalues[row][column][tau] 
+rows, columns, seps = diagonalPairs(size, minseqsep, maxseqsep)
+npairs = len(rows)
 
-for tau in range(maxlag):
-    for sep in range(size):
-        sepaveragedautocorrarray[sep][tau] /= float(size-sep)
-            
-# print sepaveragedautocorrarray[5]
-# print timeseries[testrow][testcolumn]
-# print averagevalues[testrow][testcolumn]
-# print variancevalues[testrow][testcolumn]
-# print autocorrelationvalues[testrow][testcolumn]
+# calculate autocorrelation functions, reconfiguration times and their averages over separation
+print "Calculating autocorrelation functions..."
+sepaveragedautocorrarray, reconfigurationtimes=separationAverages()
 
 # calculate reconfiguration times for all seps between minsep and maxsep
 # (sum all values of averaged autocor function before it goes to zero)
-
-# build decay time array
-print "Building decay time arrays..."
-decaytimevalues=[]
-for sep in range(0,size):
-    decaytimevalues.append(0.0)
-
-# calculate decay times
-reachedzero=0
 print "Calculating decay times..."
-for sep in range(minseqsep,maxseqsep+1):
-    decaytime=0.0
-    for tau in range(maxlag):
-        if sepaveragedautocorrarray[sep][tau] < 0:
-            reachedzero=1
-            break
-
-        decaytime += sepaveragedautocorrarray[sep][tau]
-    
-    decaytimevalues[sep] = decaytime
+decaytimevalues=numpy.zeros(size)
+decaytimevalues[minseqsep:maxseqsep+1], reachedzero=decayTimes(sepaveragedautocorrarray[minseqsep:maxseqsep+1].T)
 
-print decaytimevalues
-print reconfigurationtimes
+print decaytimevalues.tolist()
+print reconfigurationtimes.tolist()
 
-if reachedzero == 0:
+if not reachedzero.any():
     print "Warning: maxlag may be too small"
-            
-    
+
+# bootstrap confidence intervals of the decay times, the pool is forked after the store is opened
+if nbootstrap > 0:
+    print "Bootstrapping decay times with " + str(nbootstrap) + " resamples of " + str(blocklength) + " snapshot blocks..."
+    if nproc > 1:
+        pool=Pool(nproc)
+        replicates=pool.map(bootstrapDecayTimes, range(nbootstrap))
+        pool.close()
+        pool.join()
+    else:
+        replicates=map(bootstrapDecayTimes, range(nbootstrap))
+    tail=50.0*(1.0-confidencelevel)
+    lowerdecaytimes=numpy.zeros(size)
+    upperdecaytimes=numpy.zeros(size)
+    lowerdecaytimes[minseqsep:maxseqsep+1]=numpy.nanpercentile(replicates, tail, axis=0)
+    upperdecaytimes[minseqsep:maxseqsep+1]=numpy.nanpercentile(replicates, 100.0-tail, axis=0)
+    print "Decay time " + str(100*confidencelevel) + "% confidence intervals, lower and upper bounds:"
+    print lowerdecaytimes.tolist()
+    print upperdecaytimes.tolist()
@@ -1,19 +1,17 @@
 import sys
+from ColumnStatsLib import readTokenChunks
 
 filename = sys.argv[1]
 st = int(sys.argv[2])
 
-file = open(filename, 'r')
-a = file.read()
-a = a.split()
+# all numbers of the file are scanned in chunks, after skipping the first st
 max = 0
 imax = -1
 i=0
-for ia in a[st:]:
-	ia = float(ia)
-	if ia>max:
-		max = ia
-		imax = i
-	i = i + 1
+for a in readTokenChunks(filename, st):
+	ia = a.argmax()
+	if a[ia]>max:
+		max = float(a[ia])
+		imax = i + ia
+	i = i + len(a)
 print max, imax+st
-file.close()
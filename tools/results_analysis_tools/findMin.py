@@ -1,19 +1,17 @@
 import sys
+from ColumnStatsLib import readTokenChunks
 
 filename = sys.argv[1]
 st = int(sys.argv[2])
 
-file = open(filename, 'r')
-a = file.read()
-a = a.split()
+# all numbers of the file are scanned in chunks, after skipping the first st
 min = 0
 imin = -1
 i=0
-for ia in a[st:]:
-	ia = float(ia)
-	if ia<min or imin==-1:
-		min = ia
-		imin = i
-	i = i + 1
+for a in readTokenChunks(filename, st):
+	ia = a.argmin()
+	if a[ia]<min or imin==-1:
+		min = float(a[ia])
+		imin = i + ia
+	i = i + len(a)
 print min, imin+st
-file.close()